@@ -1,4 +1,3 @@
-from eddy.main import run
-
 if __name__ == "__main__":
+    from eddy.main import run
     run()
@@ -1,6 +1,11 @@
 import fitz
 
 
-def PNGFrontPageFromPDF(pdf_file):
+def PNGFrontPageFromPDF(pdf_file, width=None):
+    # When width is given, larger pages are scaled down to it.
     pdf = fitz.open(pdf_file)
-    return pdf[0].get_pixmap().tobytes()
+    page = pdf[0]
+    if width is not None and page.rect.width > width:
+        zoom = width / page.rect.width
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes()
+    return page.get_pixmap().tobytes()
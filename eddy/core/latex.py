@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+
+try:
+    from pylatexenc.latex2text import LatexNodes2Text
+    HAS_PYLATEXENC = True
+    _CONVERTER = LatexNodes2Text()
+except ImportError:
+    HAS_PYLATEXENC = False
+
+
+# Below this number of texts, the cost of dispatching to the pool exceeds the gain.
+PARALLEL_THRESHOLD = 1000
+
+# Shared by all the calls to LatexToTextMany(), created on first use.
+# Workers are spawned rather than forked, since forking a process running Qt is unsafe.
+_POOL = None
+
+
+def LatexToText(text):
+    if HAS_PYLATEXENC:
+        return _CONVERTER.latex_to_text(text)
+    return text
+
+def _LatexToTextChunk(texts):
+    return [LatexToText(t) for t in texts]
+
+def LatexToTextMany(texts):
+    # Converts a list of texts, returning the results in the same order.
+    # pylatexenc is pure Python, so large lists are split in chunks among processes.
+    global _POOL
+
+    texts = list(texts)
+    workers = os.cpu_count() or 1
+    if not HAS_PYLATEXENC or len(texts) < PARALLEL_THRESHOLD or workers == 1:
+        return _LatexToTextChunk(texts)
+
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"))
+
+    size = -(-len(texts) // (4 * workers))
+    chunks = [texts[n:n + size] for n in range(0, len(texts), size)]
+    try:
+        return [t for c in _POOL.map(_LatexToTextChunk, chunks) for t in c]
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Warning: Rendering titles serially after a failure of the process pool: {e}")
+        _POOL = None
+        return _LatexToTextChunk(texts)
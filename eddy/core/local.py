@@ -2,23 +2,40 @@ import shutil
 import itertools
 
 from eddy.core.tag import Tag, RootTag
+from eddy.core.thumbnails import ThumbnailCache
 from eddy.database.database import Database
 from eddy.database.items import ItemsTable
 from eddy.database.tags import TagsTable
+from eddy.database.migrations import MIGRATIONS
 
 
 STORAGE_FOLDER = "Files"
+THUMBNAILS_FOLDER = "Thumbnails"
 
 
 class LocalSource:
-    def __init__(self, name, file):
+    def __init__(self, name, file, profile=None):
         self.name = name
-        self.database = Database(file)
+        self.database = Database(file, MIGRATIONS, profile)
         self.table = ItemsTable(self.database)
         self.tags_table = TagsTable(self.database)
 
+        # Shared by all the views of the source, created on first use
+        self._thumbnails = None
+
     def FilesDir(self):
-        dir_ = self.database.file.parent / STORAGE_FOLDER
+        return self._Dir(STORAGE_FOLDER)
+
+    def ThumbnailsDir(self):
+        return self._Dir(THUMBNAILS_FOLDER)
+
+    def Thumbnails(self):
+        if self._thumbnails is None:
+            self._thumbnails = ThumbnailCache(self.ThumbnailsDir())
+        return self._thumbnails
+
+    def _Dir(self, name):
+        dir_ = self.database.file.parent / name
         if not dir_.is_dir():
             try:
                 dir_.mkdir()
@@ -46,11 +63,10 @@ class LocalSource:
         return renamings
 
     def AssignToTag(self, ids, tag_id):
-        for i in ids:
-            r = self.table.GetRow(i, ("tags",))
-            if tag_id not in r["tags"]:
-                r["tags"].append(tag_id)
-                self.table.EditRow(i, r)
+        records = zip(ids, self.table.GetRows(ids, ("tags",)))
+        self.table.EditRows({
+            i: {"tags": r["tags"] + [tag_id]} for (i, r) in records if tag_id not in r["tags"]
+        })
 
     def DropTagFromItem(self, id_, tag_id):
         record = self.table.GetRow(id_, ("tags",))
@@ -65,18 +81,19 @@ class LocalSource:
         return Tag(self, id_, name, parent)
 
     def DropTag(self, tag_id):
-        items = self.table.GetTable(("id", "tags"), tags=(tag_id,))
-        for i in items:
-            i["tags"].remove(tag_id)
-            self.table.EditRow(i["id"], {"tags": i["tags"]})
+        self._DropTags((tag_id,))
+
+    def _DropTags(self, tag_ids):
+        items = self.table.GetTable(("id", "tags"), tags=tag_ids)
+        self.table.EditRows({
+            i["id"]: {"tags": [t for t in i["tags"] if t not in tag_ids]} for i in items
+        })
 
     def DeleteTagAndChildren(self, id_):
-        self.tags_table.Delete((id_,))
-        self.DropTag(id_)
-        for t in self.tags_table.ChildTags(id_, recursive=True):
-            id_ = t["id"]
-            self.tags_table.Delete((id_,))
-            self.DropTag(id_)
+        ids = [id_] + [t["id"] for t in self.tags_table.ChildTags(id_, recursive=True)]
+        with self.database.Transaction():
+            self.tags_table.Delete(ids)
+            self._DropTags(ids)
 
     def TagNames(self):
         tags = self.tags_table.GetTable()
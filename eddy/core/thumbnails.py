@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import hashlib
+import multiprocessing
+import os
+import tempfile
+
+from PySide2.QtCore import QObject, Signal
+
+from eddy.core.documents import PNGFrontPageFromPDF
+
+
+# Width in pixels of the thumbnails, twice the width at which covers are displayed
+THUMBNAIL_WIDTH = 600
+
+_MAX_WORKERS = 4
+
+# Shared by all the caches, created on first use.
+# Workers are spawned rather than forked, since forking a process running Qt is unsafe.
+_POOL = None
+
+
+def _Pool():
+    global _POOL
+
+    if _POOL is None:
+        workers = min(os.cpu_count() or 1, _MAX_WORKERS)
+        _POOL = ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"))
+    return _POOL
+
+def _WriteThumbnail(document, thumbnail):
+    png = PNGFrontPageFromPDF(document, THUMBNAIL_WIDTH)
+    # The file is renamed once complete, so that a partial thumbnail is never served.
+    # Its temporary name is unique, as another process may be writing the same thumbnail.
+    with tempfile.NamedTemporaryFile(dir=thumbnail.parent, suffix=".tmp", delete=False) as f:
+        f.write(png)
+    try:
+        os.replace(f.name, thumbnail)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+class ThumbnailCache(QObject):
+    ''' Thumbnails of the front pages of documents, stored as PNG files in a folder.
+        A thumbnail is named after the path, size and modification time of its document,
+        so that it is regenerated whenever the document changes.
+        Missing thumbnails are generated in worker processes, and ThumbnailReady is emitted
+        with the path of the document once each is available.
+    '''
+
+    ThumbnailReady = Signal(object)
+
+    # Emitted from the threads of the pool, to pass the results to the thread of the cache
+    _Generated = Signal(object, object, object)
+
+    def __init__(self, folder, parent=None):
+        super().__init__(parent)
+
+        self._folder = folder
+        self._pending = set()
+        self._failed = set()
+
+        self._Generated.connect(self._HandleGenerated)
+
+    def Thumbnail(self, document):
+        # Returns the path of the thumbnail of document, or None if it is not available yet.
+        if self._folder is None or document.suffix != ".pdf":
+            return None
+
+        try:
+            stat = document.stat()
+        except OSError:
+            return None
+        key = f"{document}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        thumbnail = self._folder / f"{hashlib.sha1(key.encode()).hexdigest()}.png"
+
+        if thumbnail.is_file():
+            return thumbnail
+        if thumbnail in self._pending or thumbnail in self._failed:
+            return None
+
+        self._pending.add(thumbnail)
+        future = _Pool().submit(_WriteThumbnail, document, thumbnail)
+        future.add_done_callback(partial(self._HandleDone, document, thumbnail))
+        return None
+
+    def _HandleDone(self, document, thumbnail, future):
+        self._Generated.emit(document, thumbnail, future.exception())
+
+    def _HandleGenerated(self, document, thumbnail, error):
+        global _POOL
+
+        self._pending.discard(thumbnail)
+
+        if error is not None:
+            print(f"Warning: Could not generate the thumbnail of {document}: {error}")
+            if isinstance(error, BrokenProcessPool):
+                _POOL = None
+            else:
+                self._failed.add(thumbnail)
+            return
+
+        self.ThumbnailReady.emit(document)
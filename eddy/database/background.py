@@ -0,0 +1,159 @@
+import sqlite3
+
+from PySide2.QtCore import QObject, QThread, QCoreApplication, Signal
+
+from eddy.database.database import Database
+from eddy.database.items import ItemsTable
+
+
+class _QueryWorker(QObject):
+    ''' Runs filter queries on its own thread, with its own connections to database files.
+        Requests which have been superseded by the time they are reached are skipped.
+    '''
+
+    Finished = Signal(int, int, object)
+    Failed = Signal(int, int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # Maps a requester to the generation of its latest request
+        self.latest = {}
+        # The database on which a query is running, as (requester, database)
+        self.running = None
+
+        self._databases = {}
+        self._tables = {}
+
+    def Run(self, requester, generation, file, profile, name, filter_strings, tags):
+        if self.latest.get(requester, None) != generation:
+            return
+
+        try:
+            table = self._Table(file, profile, name)
+            self.running = (requester, table.database)
+            data = table.GetTable(("id",), None, filter_strings, tags)
+            ids = {d["id"] for d in data}
+        except sqlite3.OperationalError as e:
+            if str(e) != "interrupted":
+                self.Failed.emit(requester, generation, str(e))
+                return
+            ids = None
+        except Exception as e:
+            # Any error is reported, so that the requester does not wait for a result forever.
+            self.Failed.emit(requester, generation, str(e))
+            return
+        finally:
+            self.running = None
+
+        self.Finished.emit(requester, generation, ids)
+
+    def _Table(self, file, profile, name):
+        if (database := self._databases.get(file, None)) is None:
+            database = Database(file, profile=profile)
+            self._databases[file] = database
+        if (table := self._tables.get((file, name), None)) is None:
+            table = ItemsTable(database, name)
+            self._tables[(file, name)] = table
+        return table
+
+    def Close(self):
+        self._tables = {}
+        self._databases = {}
+
+
+_THREAD = None
+_WORKER = None
+
+def _Worker():
+    # The worker thread is shared by all the requesters and started on first use.
+    global _THREAD, _WORKER
+
+    if _WORKER is None:
+        _THREAD = QThread()
+        _WORKER = _QueryWorker()
+        _WORKER.moveToThread(_THREAD)
+        _THREAD.finished.connect(_WORKER.Close)
+        QCoreApplication.instance().aboutToQuit.connect(_StopWorker)
+        _THREAD.start()
+
+    return _WORKER
+
+def _StopWorker():
+    _THREAD.quit()
+    _THREAD.wait()
+
+
+class BackgroundQuery(QObject):
+    ''' Runs the filter queries of ItemsTable objects backed by a file on a worker thread.
+        Each request supersedes the previous ones, and only the result of the latest one
+        is delivered by Finished, as its filter strings and tags with the set of matching ids.
+        If the query fails, Failed is emitted instead with its filter strings and tags.
+    '''
+
+    Finished = Signal(object, object, object)
+    Failed = Signal(object, object)
+
+    _Requested = Signal(int, int, str, object, str, object, object)
+
+    _count = 0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        BackgroundQuery._count = BackgroundQuery._count + 1
+        self._requester = BackgroundQuery._count
+
+        self._generation = 0
+        self._request = None
+
+        self._worker = _Worker()
+        self._Requested.connect(self._worker.Run)
+        self._worker.Finished.connect(self._HandleFinished)
+        self._worker.Failed.connect(self._HandleFailed)
+
+    @staticmethod
+    def Supports(table):
+        return table.database.file != ":memory:"
+
+    def Run(self, table, filter_strings, tags):
+        self.Cancel()
+        database = table.database
+        self._request = (str(database.file), database.profile, table.name, filter_strings, tags)
+        self._worker.latest[self._requester] = self._generation
+        self._Requested.emit(self._requester, self._generation, *self._request)
+
+    def Cancel(self):
+        # Drops the result of the latest request, interrupting its query if it is running.
+        self._generation = self._generation + 1
+        self._request = None
+        if (running := self._worker.running) is not None and running[0] == self._requester:
+            running[1].connection.interrupt()
+
+    def IsRunning(self):
+        return self._request is not None
+
+    def _HandleFinished(self, requester, generation, ids):
+        if requester != self._requester or generation != self._generation:
+            return
+
+        if ids is None:
+            # The query has been interrupted, although it was still the latest one.
+            # This can only happen if it started just as an older one was cancelled.
+            self._generation = self._generation + 1
+            self._worker.latest[self._requester] = self._generation
+            self._Requested.emit(self._requester, self._generation, *self._request)
+            return
+
+        (*_, filter_strings, tags) = self._request
+        self._request = None
+        self.Finished.emit(filter_strings, tags, ids)
+
+    def _HandleFailed(self, requester, generation, message):
+        if requester != self._requester or generation != self._generation:
+            return
+
+        (*_, filter_strings, tags) = self._request
+        self._request = None
+        print(f"Warning: Filtering in the background failed: {message}")
+        self.Failed.emit(filter_strings, tags)
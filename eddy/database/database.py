@@ -1,11 +1,26 @@
+from contextlib import contextmanager
+import json
 import sqlite3
 from pathlib import Path
 
 from PySide2.QtCore import QObject, Signal
 
 
+# Connection settings, applied as PRAGMA statements when a database is opened.
+# Individual settings can be overridden by passing a (partial) profile to Database.
+# A setting given as None is not applied, leaving the one stored in the file, if any.
+DEFAULT_PROFILE = {
+    "auto_vacuum": "NONE",              # Only effective if set before any table is created
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,     # In bytes
+    "cache_size": -64 * 1024            # Negative values are in KiB, positive ones in pages
+}
+
+
 class Database(QObject):
-    def __init__(self, file=":memory:", parent=None):
+    def __init__(self, file=":memory:", migrations=None, profile=None, parent=None):
         super().__init__(parent)
 
         match file:
@@ -17,15 +32,130 @@ class Database(QObject):
                 self.file = file.resolve()
 
         self.connection = sqlite3.connect(self.file, isolation_level=None)
+        self._ApplyProfile(profile)
+
+        self._transaction_depth = 0
+        self._deferred_tables = {}  # Used as an ordered set
+
+        if migrations is not None:
+            self.Migrate(migrations)
 
     def __del__(self):
         self.connection.close()
         print(f"Closing connection to database '{self.file}'")
 
+    def _ApplyProfile(self, profile):
+        profile = {**DEFAULT_PROFILE, **(profile if profile is not None else {})}
+
+        # The settings in effect, used to open further connections to the same file
+        self.profile = {}
+
+        cursor = self.connection.cursor()
+        for (k, v) in profile.items():
+            if k not in DEFAULT_PROFILE:
+                print(f"Warning: Ignoring unknown setting '{k}' for database '{self.file}'")
+                continue
+            if v is not None:
+                cursor.execute(f"PRAGMA {k} = {v}")
+            self.profile[k] = v
+
+    def Version(self):
+        return self.connection.execute("PRAGMA user_version").fetchone()[0]
+
+    def Migrate(self, migrations):
+        # migrations is a sequence of functions taking the database as their only argument.
+        # The schema version, stored in user_version, is the number of migrations applied.
+        version = self.Version()
+
+        if version > len(migrations):
+            print(
+                f"Warning: database '{self.file}' has schema version {version}, "
+                f"but the latest known version is {len(migrations)}"
+            )
+            return
+
+        for (v, m) in enumerate(migrations[version:], start=version + 1):
+            with self.Transaction():
+                m(self)
+                self.connection.execute(f"PRAGMA user_version = {v}")
+
+    @contextmanager
+    def Transaction(self):
+        # Groups all the writes in the block into a single commit.
+        # Transactions can be nested, in which case they are implemented as savepoints
+        # and only the outermost one commits. Tables defer their Updated() signals
+        # until the outermost transaction ends, so that each is emitted at most once.
+
+        savepoint = f"transaction_{self._transaction_depth}"
+        self.connection.execute(f"SAVEPOINT {savepoint}")
+        self._transaction_depth = self._transaction_depth + 1
+
+        try:
+            yield
+        except:
+            self.connection.execute(f"ROLLBACK TO {savepoint}")
+            # The changes recorded so far can no longer be trusted.
+            for t in self._deferred_tables:
+                t.ResetChanges()
+            raise
+        finally:
+            self.connection.execute(f"RELEASE {savepoint}")
+            self._transaction_depth = self._transaction_depth - 1
+            if self._transaction_depth == 0:
+                tables = list(self._deferred_tables)
+                self._deferred_tables.clear()
+                for t in tables:
+                    t.EmitUpdated()
+
+    def InTransaction(self):
+        return self._transaction_depth > 0
+
+    def Defer(self, table):
+        self._deferred_tables[table] = None
+
+
+class Changes:
+    ''' The rows affected by a sequence of writes to a Table.
+        inserted lists the ids of new rows, in order of insertion, updated maps the ids of
+        modified rows to the set of keys that changed, and deleted is the set of removed ids.
+        When reset is True, the changes are unknown and the whole table should be reloaded.
+    '''
+
+    def __init__(self):
+        self._inserted = {}     # Used as an ordered set
+        self.updated = {}
+        self.deleted = set()
+        self.reset = False
+
+    def __bool__(self):
+        return self.reset or bool(self._inserted or self.updated or self.deleted)
+
+    @property
+    def inserted(self):
+        return list(self._inserted)
+
+    def Insert(self, ids):
+        for i in ids:
+            self._inserted[i] = None
+
+    def Update(self, ids, keys):
+        for i in ids:
+            if i not in self._inserted:
+                self.updated.setdefault(i, set()).update(keys)
+
+    def Delete(self, ids):
+        for i in ids:
+            if i in self._inserted:
+                del self._inserted[i]
+                continue
+            self.updated.pop(i, None)
+            self.deleted.add(i)
+
 
 class Table(QObject):
     Cleared = Signal()
     Updated = Signal()
+    Changed = Signal(Changes)
 
     _KEYS = {"id": "INTEGER PRIMARY KEY"}
 
@@ -42,11 +172,16 @@ class Table(QObject):
         self._name = name
         self._drop_on_del = drop_on_del
 
+        self._changes = Changes()
+
+    @property
+    def name(self):
+        return self._name
+
     def __del__(self):
         if self._drop_on_del:
             try:
-                cursor = self.Cursor()
-                cursor.execute(f"DROP TABLE IF EXISTS {self._name}")
+                self._Drop(self.Cursor())
                 print(f"Dropping table '{self._name}'")
             except sqlite3.ProgrammingError:
                 # If the database connection has already been closed, we simply ignore this step.
@@ -55,65 +190,158 @@ class Table(QObject):
     def Cursor(self):
         return self.database.connection.cursor()
 
+    def _TableNames(self):
+        # The tables holding the data of this one, which Size() counts with their indexes.
+        return [self._name]
+
+    def Size(self):
+        # Returns the number of bytes taken by the tables of _TableNames() and their indexes,
+        # or None if SQLite is built without the dbstat table.
+        # Only the pages of these objects are visited, rather than the whole database.
+        table_names = self._TableNames()
+        cursor = self.Cursor()
+        try:
+            cursor.execute(
+                f"SELECT SUM(pgsize) FROM dbstat WHERE aggregate = TRUE AND name IN ("
+                f"SELECT name FROM sqlite_master "
+                f"WHERE tbl_name IN ({', '.join('?' * len(table_names))}))",
+                table_names
+            )
+        except sqlite3.OperationalError:
+            return None
+        return cursor.fetchone()[0] or 0
+
+    def Transaction(self):
+        return self.database.Transaction()
+
+    def EmitUpdated(self):
+        # Emits the changes recorded since the last call, followed by Updated().
+        (changes, self._changes) = (self._changes, Changes())
+        if changes:
+            self.Changed.emit(changes)
+        self.Updated.emit()
+
+    def ResetChanges(self):
+        self._changes.reset = True
+
+    def _NotifyUpdated(self):
+        if self.database.InTransaction():
+            self.database.Defer(self)
+        else:
+            self.EmitUpdated()
+
     def Clear(self):
         cursor = self.Cursor()
+        self._Drop(cursor)
+        self._Create(cursor)
+
+        self._changes = Changes()
+        self.Cleared.emit()
+
+    def _Drop(self, cursor):
         cursor.execute(f"DROP TABLE IF EXISTS {self._name}")
 
+    def _Create(self, cursor):
         keys = ", ".join([f"{k} {t}" for k, t in self._KEYS.items()])
         cursor.execute(f"CREATE TABLE {self._name} ({keys})")
 
-        self.Cleared.emit()
+    def Exists(self, name=None):
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+
+        cursor = self.Cursor()
+        cursor.execute(query, (self._name if name is None else name,))
+        return cursor.fetchone() is not None
 
     def AddData(self, data):
-        keys = self._DEFAULTS.keys()
+        with self.Transaction():
+            ids = self._Insert(data)
 
-        keys_str = f"({', '.join(keys)})"
-        placeholder = f"({', '.join('?' * len(keys))})"
+            self._changes.Insert(ids)
+            self._NotifyUpdated()
+
+        return ids[-1] if ids != [] else None
+
+    def UpsertData(self, data):
+        # Rows with an "id" matching an existing row only have the given keys updated.
+        # All the other rows are inserted, using default values for the missing keys,
+        # and keeping their "id" if one is given.
+        query = f"SELECT id FROM {self._name} WHERE id IN (SELECT value FROM json_each(?))"
+        given_ids = [d["id"] for d in data if "id" in d]
+
+        cursor = self.Cursor()
+        cursor.execute(query, (json.dumps(given_ids),))
+        existing_ids = {t[0] for t in cursor.fetchall()}
+
+        with self.Transaction():
+            self.EditRows({d["id"]: d for d in data if d.get("id", None) in existing_ids})
+
+            ids = self._Insert(
+                [d for d in data if d.get("id", None) not in existing_ids], keep_ids=True
+            )
+            if ids != []:
+                self._changes.Insert(ids)
+                self._NotifyUpdated()
+
+    def _Insert(self, data, keep_ids=False):
+        keys = list(self._DEFAULTS.keys())
+
+        keys_str = f"({', '.join(['id'] + keys)})"
+        placeholder = f"({', '.join('?' * (len(keys) + 1))})"
         query = f"INSERT INTO {self._name}{keys_str} VALUES {placeholder}"
         values = [
-            tuple(
+            (d.get("id", None) if keep_ids else None,) + tuple(
                 self._ENCODE_FUNCTIONS.get(k, lambda x: x)(d.get(k, self._DEFAULTS[k]))
                 for k in keys
             )
             for d in data
         ]
 
+        # We call execute() rather than executemany() to collect the id of every new row.
         cursor = self.Cursor()
+        ids = []
+        for v in values:
+            cursor.execute(query, v)
+            ids.append(cursor.lastrowid)
 
-        # To get a valid lastrowid, we need to call execute() rather than executemany().
-        if len(values) == 1:
-            cursor.execute(query, values[0])
-        else:
-            cursor.executemany(query, values)
-
-        self.Updated.emit()
-        return cursor.lastrowid
+        return ids
 
     def Delete(self, ids):
         query = f"DELETE FROM {self._name} WHERE id = ?"
-        ids = [(i,) for i in ids]
+        ids = list(ids)
 
         cursor = self.Cursor()
-        cursor.executemany(query, ids)
 
-        self.Updated.emit()
+        with self.Transaction():
+            cursor.executemany(query, [(i,) for i in ids])
+
+            self._changes.Delete(ids)
+            self._NotifyUpdated()
 
     def GetRow(self, id_, keys=None):
+        return self.GetRows((id_,), keys)[0]
+
+    def GetRows(self, ids, keys=None):
+        # Fetches any number of rows with a single statement, passing the ids as a JSON array.
+        # The rows are returned in the same order as ids.
         if keys is None:
-            keys_ = self._DEFAULTS.keys()
+            keys_ = list(self._DEFAULTS.keys())
         else:
             keys_ = list({k for k in keys if k in self._DEFAULTS.keys()})
 
-        query = f"SELECT {', '.join(keys_)} FROM {self._name} WHERE id = {id_}"
+        query = (
+            f"SELECT {', '.join(['id'] + keys_)} FROM {self._name} "
+            f"WHERE id IN (SELECT value FROM json_each(?))"
+        )
 
         cursor = self.Cursor()
-        cursor.execute(query)
-        data = dict(zip(keys_, cursor.fetchone()))
+        cursor.execute(query, (json.dumps(list(ids)),))
+        data = {t[0]: dict(zip(keys_, t[1:])) for t in cursor.fetchall()}
         for k in self._DECODE_FUNCTIONS:
             if k in keys_:
-                data[k] = self._DECODE_FUNCTIONS[k](data[k])
+                for d in data.values():
+                    d[k] = self._DECODE_FUNCTIONS[k](d[k])
 
-        return data
+        return [data[i] for i in ids]
 
     def GetTable(self, keys=None):
         if keys is None:
@@ -134,18 +362,33 @@ class Table(QObject):
         return data
 
     def EditRow(self, id_, data):
-        keys = [k for k in data.keys() if k in self._DEFAULTS.keys()]
+        self.EditRows({id_: data})
 
-        keys_str = f"({', '.join(keys)})"
-        placeholder = f"({', '.join('?' * len(keys))})"
+    def EditRows(self, mapping):
+        # mapping associates ids to dictionaries of the values to be changed.
+        # Rows with the same set of keys are updated with a single executemany().
+        if len(mapping) == 0:
+            return
 
-        query = f"UPDATE {self._name} SET {keys_str} = {placeholder} WHERE id = ?"
-
-        values = [self._ENCODE_FUNCTIONS.get(k, lambda x: x)(data[k]) for k in keys]
-        values.append(id_)
-        values = tuple(values)
+        groups = {}
+        for (id_, data) in mapping.items():
+            keys = tuple(k for k in data.keys() if k in self._DEFAULTS.keys())
+            values = tuple(self._ENCODE_FUNCTIONS.get(k, lambda x: x)(data[k]) for k in keys)
+            groups.setdefault(keys, []).append(values + (id_,))
 
         cursor = self.Cursor()
-        cursor.execute(query, values)
 
-        self.Updated.emit()
+        with self.Transaction():
+            for (keys, values) in groups.items():
+                if keys == ():
+                    continue
+
+                keys_str = f"({', '.join(keys)})"
+                placeholder = f"({', '.join('?' * len(keys))})"
+
+                query = f"UPDATE {self._name} SET {keys_str} = {placeholder} WHERE id = ?"
+                cursor.executemany(query, values)
+
+                self._changes.Update([v[-1] for v in values], keys)
+
+            self._NotifyUpdated()
@@ -1,4 +1,7 @@
+from collections import OrderedDict
 import json
+import re
+import sqlite3
 
 from eddy.database.database import Table
 
@@ -13,6 +16,17 @@ class SortBy():
 
 
 class ItemsTable(Table):
+    # Names of the item types, as {code: name}
+    TYPES = {
+        "A": "Article",
+        "B": "Book",
+        "C": "Book Chapter",
+        "N": "Note",
+        "P": "Conference Proceedings",
+        "R": "Report",
+        "T": "Thesis"
+    }
+
     _KEYS = {
         "id": "INTEGER PRIMARY KEY",
         "type": "TEXT",
@@ -21,6 +35,7 @@ class ItemsTable(Table):
         "authors_bais": "TEXT",
         "editors": "TEXT",
         "editors_bais": "TEXT",
+        "collaborations": "TEXT",
         "title": "TEXT",
         "abstract": "TEXT",
         "publication": "TEXT",
@@ -54,6 +69,7 @@ class ItemsTable(Table):
         "authors_bais": [],
         "editors": [],
         "editors_bais": [],
+        "collaborations": [],
         "title": None,
         "abstract": None,
         "publication": None,
@@ -85,6 +101,7 @@ class ItemsTable(Table):
         "authors_bais": json.dumps,
         "editors": json.dumps,
         "editors_bais": json.dumps,
+        "collaborations": json.dumps,
         "isbns": json.dumps,
         "arxiv_cats": json.dumps,
         "dois": json.dumps,
@@ -98,6 +115,7 @@ class ItemsTable(Table):
         "authors_bais": json.loads,
         "editors": json.loads,
         "editors_bais": json.loads,
+        "collaborations": json.loads,
         "isbns": json.loads,
         "arxiv_cats": json.loads,
         "dois": json.loads,
@@ -106,30 +124,313 @@ class ItemsTable(Table):
         "tags": json.loads
     }
 
+    # Columns indexed for full-text filtering
+    SEARCH_KEYS = (
+        "title",
+        "authors",
+        "editors",
+        "abstract",
+        "texkey"
+    )
+
+    # Secondary indexes, as {name suffix: indexed expression}.
+    # Items are sorted in memory, and the index on date only gives the order in which
+    # TableData loads them.
+    _INDEXES = {
+        "date": "date"
+    }
+
+    # Indexes of earlier versions, which no query used, but which every write had to update
+    _UNUSED_INDEXES = ("inspire_id", "arxiv_id", "texkey", "doi", "citations")
+
     def __init__(self, database, name="items", drop_on_del=False, parent=None):
         super().__init__(database, name, drop_on_del, parent)
 
-    def GetTable(self, keys, sort_by=None, filter_strings=(), tags=()):
-        keys = list({k for k in keys if k in self._KEYS.keys()})
+        # Normalized (item_id, tag_id) relation mirroring the JSON tags column.
+        # It is kept in sync by triggers, so that every write path goes through it.
+        self._tags_name = f"{name}_tags"
+
+        # External-content FTS5 index over the text columns, used by the filter.
+        # If SQLite is built without FTS5, GetTable falls back to LIKE patterns.
+        self._search_name = f"{name}_search"
+
+        self._has_search_index = self.Exists(self._search_name)
+
+        # Title and authors as rendered for display, which are costly to compute.
+        # Entries are removed by triggers when the columns they depend on change.
+        self._display_name = f"{name}_display"
+
+        # Complete decoded records of the items last requested with GetRow(), as {id: record}
+        # from the least to the most recently used. An entry is dropped as soon as its item
+        # is written, rather than when Changed() is emitted, which can be deferred.
+        self._records = OrderedDict()
+
+    # Number of records kept by GetRow()
+    _RECORDS_CACHE_SIZE = 256
+
+    def _TableNames(self):
+        # The search index keeps its data in the shadow tables of FTS5.
+        return [
+            self._name,
+            self._tags_name,
+            self._display_name,
+            *(f"{self._search_name}_{s}" for s in ("data", "idx", "docsize", "config"))
+        ]
+
+    def GetRow(self, id_, keys=None):
+        # The widgets showing an item share its cached record, but each gets its own copy.
+        if (record := self._records.get(id_, None)) is None:
+            record = self.GetRows((id_,))[0]
+            self._records[id_] = record
+            if len(self._records) > ItemsTable._RECORDS_CACHE_SIZE:
+                self._records.popitem(last=False)
+        else:
+            self._records.move_to_end(id_)
+
+        keys = self._DEFAULTS.keys() if keys is None else [k for k in keys if k in self._DEFAULTS]
+        return {k: list(v) if isinstance(v := record[k], list) else v for k in keys}
+
+    def EditRows(self, mapping):
+        for i in mapping:
+            self._records.pop(i, None)
+        super().EditRows(mapping)
+
+    def Delete(self, ids):
+        ids = list(ids)
+        for i in ids:
+            self._records.pop(i, None)
+        super().Delete(ids)
+
+    def Clear(self):
+        self._records.clear()
+        super().Clear()
+
+    def ResetChanges(self):
+        # After a rollback, any record may be stale.
+        self._records.clear()
+        super().ResetChanges()
+
+    def _Drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {self._display_name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {self._search_name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {self._tags_name}")
+        super()._Drop(cursor)
+
+    def _Create(self, cursor):
+        super()._Create(cursor)
+        self.CreateTagsTable()
+        self.CreateSearchIndex()
+        self.CreateIndexes()
+        self.CreateDisplayCache()
+
+    # The following methods are idempotent: besides being used when the table is created,
+    # they are run by the schema migrations to upgrade existing database files.
+
+    def CreateTagsTable(self):
+        name = self._name
+        tags_name = self._tags_name
+
+        cursor = self.Cursor()
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {tags_name} ("
+            f"item_id INTEGER NOT NULL, tag_id INTEGER NOT NULL, "
+            f"PRIMARY KEY (tag_id, item_id)) WITHOUT ROWID"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {tags_name}_item_id ON {tags_name} (item_id)"
+        )
+
+        insert_tags = (
+            f"INSERT OR IGNORE INTO {tags_name} (item_id, tag_id) "
+            f"SELECT new.id, value FROM json_each(new.tags);"
+        )
+        delete_tags = f"DELETE FROM {tags_name} WHERE item_id = old.id;"
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {tags_name}_insert AFTER INSERT ON {name} "
+            f"BEGIN {insert_tags} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {tags_name}_update AFTER UPDATE OF tags ON {name} "
+            f"BEGIN {delete_tags} {insert_tags} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {tags_name}_delete AFTER DELETE ON {name} "
+            f"BEGIN {delete_tags} END"
+        )
+
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {tags_name} (item_id, tag_id) "
+            f"SELECT i.id, j.value FROM {name} i, json_each(i.tags) j"
+        )
+
+    def CreateSearchIndex(self):
+        name = self._name
+        search_name = self._search_name
+        keys = ", ".join(self.SEARCH_KEYS)
+        new_values = ", ".join(f"new.{k}" for k in self.SEARCH_KEYS)
+        old_values = ", ".join(f"old.{k}" for k in self.SEARCH_KEYS)
+
+        cursor = self.Cursor()
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_name} USING fts5("
+                f"{keys}, content='{name}', content_rowid='id')"
+            )
+        except sqlite3.OperationalError:
+            # FTS5 is not available in this build of SQLite
+            self._has_search_index = False
+            return
+
+        insert_entry = (
+            f"INSERT INTO {search_name} (rowid, {keys}) VALUES (new.id, {new_values});"
+        )
+        delete_entry = (
+            f"INSERT INTO {search_name} ({search_name}, rowid, {keys}) "
+            f"VALUES ('delete', old.id, {old_values});"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {search_name}_insert AFTER INSERT ON {name} "
+            f"BEGIN {insert_entry} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {search_name}_update AFTER UPDATE OF {keys} ON {name} "
+            f"BEGIN {delete_entry} {insert_entry} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {search_name}_delete AFTER DELETE ON {name} "
+            f"BEGIN {delete_entry} END"
+        )
+
+        cursor.execute(f"INSERT INTO {search_name} ({search_name}) VALUES ('rebuild')")
+        self._has_search_index = True
+
+    def CreateIndexes(self):
+        name = self._name
+
+        cursor = self.Cursor()
+        for (k, e) in ItemsTable._INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name}_{k} ON {name} ({e})")
+
+    def DropUnusedIndexes(self):
+        name = self._name
+
+        cursor = self.Cursor()
+        for k in ItemsTable._UNUSED_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}_{k}")
+
+    def CreateDisplayCache(self):
+        name = self._name
+        display_name = self._display_name
+
+        cursor = self.Cursor()
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {display_name} ("
+            f"id INTEGER PRIMARY KEY, title TEXT, authors TEXT)"
+        )
+
+        delete_entry = f"DELETE FROM {display_name} WHERE id = old.id;"
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {display_name}_update "
+            f"AFTER UPDATE OF title, authors, editors, collaborations ON {name} "
+            f"BEGIN {delete_entry} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {display_name}_delete AFTER DELETE ON {name} "
+            f"BEGIN {delete_entry} END"
+        )
+
+    def AddCollaborations(self):
+        name = self._name
+        display_name = self._display_name
+
+        cursor = self.Cursor()
+        cursor.execute(f"SELECT 1 FROM pragma_table_info('{name}') WHERE name = 'collaborations'")
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {name} ADD COLUMN collaborations TEXT DEFAULT '[]'")
+
+        # The displayed authors now depend on the collaborations.
+        cursor.execute(f"DROP TRIGGER IF EXISTS {display_name}_update")
+        cursor.execute(f"DELETE FROM {display_name}")
+        self.CreateDisplayCache()
+
+    def GetDisplay(self, ids=None):
+        # Returns the cached entries as {id: (title, authors)}, for all the items if ids is None.
+        # Items without an entry are left out, and must be rendered and stored with SetDisplay().
+        query = f"SELECT id, title, authors FROM {self._display_name}"
+        parameters = ()
+        if ids is not None:
+            query = f"{query} WHERE id IN (SELECT value FROM json_each(?))"
+            parameters = (json.dumps(list(ids)),)
+
+        cursor = self.Cursor()
+        cursor.execute(query, parameters)
+        return {t[0]: t[1:] for t in cursor.fetchall()}
+
+    def SetDisplay(self, entries):
+        # Stores entries given as {id: (title, authors)}.
+        if not entries:
+            return
+
+        # A single commit, rather than one per entry. Nothing is emitted, as the items
+        # themselves do not change.
+        with self.Transaction():
+            cursor = self.Cursor()
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {self._display_name} (id, title, authors) "
+                f"VALUES (?, ?, ?)",
+                [(i, *e) for (i, e) in entries.items()]
+            )
+
+    def HasSearchIndex(self):
+        return self._has_search_index
+
+    @staticmethod
+    def _SearchQuery(filter_strings):
+        # Every word is matched as a prefix of the tokens in any of the indexed columns.
+        # Words without any alphanumeric character produce no tokens and are dropped.
+        return " ".join(
+            '"{}"*'.format(f.replace('"', '""'))
+            for f in filter_strings if re.search(r"[^\W_]", f)
+        )
+
+    def GetTable(self, keys=None, sort_by=None, filter_strings=(), tags=(), ids=None):
+        # When ids is given, only the rows with those ids are considered.
+        if keys is None:
+            keys = list(self._KEYS.keys())
+        else:
+            keys = list({k for k in keys if k in self._KEYS.keys()})
 
         where_clauses = []
-        if (n_filters := len(filter_strings)) > 0:
+        patterns = ()
+        if self._has_search_index:
+            if (search_query := ItemsTable._SearchQuery(filter_strings)) != "":
+                where_clauses.append(
+                    f"id IN (SELECT rowid FROM {self._search_name} "
+                    f"WHERE {self._search_name} MATCH ?)"
+                )
+                patterns = (search_query,)
+        elif (n_filters := len(filter_strings)) > 0:
             where_clauses.append(f"({' AND '.join(['authors || title LIKE ?'] * n_filters)})")
+            patterns = tuple(f"%{f}%" for f in filter_strings)
         if (n_tags := len(tags)) > 0:
-            format_tags = "replace(replace(replace(tags, '[', ' '), ']', ' '), ',', '')"
-            where_clauses.append(f"({' OR '.join([f'{format_tags} LIKE ?'] * n_tags)})")
+            where_clauses.append(
+                f"id IN (SELECT item_id FROM {self._tags_name} "
+                f"WHERE tag_id IN ({', '.join('?' * n_tags)}))"
+            )
+        if ids is not None:
+            where_clauses.append("id IN (SELECT value FROM json_each(?))")
         where_string = " AND ".join(where_clauses)
 
         query = f"SELECT {', '.join(keys)} FROM {self._name}"
         if where_string != "":
             query = f"{query} WHERE {where_string}"
         if sort_by is not None:
-            query = f"{query} ORDER BY {sort_by.key} {sort_by.order}"
+            # Ties are broken by id, so that the order is deterministic.
+            query = f"{query} ORDER BY {sort_by.key} {sort_by.order}, id {sort_by.order}"
 
-        patterns = (
-            tuple(f"%{f}%" for f in filter_strings)
-            + tuple(f"% {t} %" for t in tags)
-        )
+        patterns = patterns + tuple(tags)
+        if ids is not None:
+            patterns = patterns + (json.dumps(list(ids)),)
 
         cursor = self.Cursor()
         cursor.execute(query, patterns)
@@ -141,14 +442,32 @@ class ItemsTable(Table):
 
         return data
 
-    def GetTotalCitations(self, ids):
-        count = 0
+    def GetStatistics(self, ids=None):
+        # Returns aggregate statistics of the given items, or of all of them, computed
+        # from a single query. Missing citations count as zero, while items without
+        # a date or a type are counted under None.
+        query = f"SELECT citations, NULLIF(substr(date, 1, 4), ''), type FROM {self._name}"
+        parameters = ()
+        if ids is not None:
+            query = f"{query} WHERE id IN (SELECT value FROM json_each(?))"
+            parameters = (json.dumps(list(ids)),)
 
-        for i in ids:
-            query = f"SELECT citations FROM {self._name} WHERE id = {i}"
+        cursor = self.Cursor()
+        cursor.execute(query, parameters)
+        rows = cursor.fetchall()
 
-            cursor = self.Cursor()
-            cursor.execute(query)
-            count = count + int(cursor.fetchone()[0])
+        citations = sorted((c if c is not None else 0 for (c, _, _) in rows), reverse=True)
+        years = {}
+        types = {}
+        for (_, y, t) in rows:
+            years[y] = years.get(y, 0) + 1
+            types[t] = types.get(t, 0) + 1
 
-        return count
+        return {
+            "count": len(rows),
+            "citations": sum(citations),
+            # The largest h such that h items have at least h citations each
+            "h_index": sum(1 for (n, c) in enumerate(citations, start=1) if c >= n),
+            "years": years,
+            "types": types
+        }
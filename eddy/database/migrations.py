@@ -0,0 +1,42 @@
+from eddy.database.items import ItemsTable
+from eddy.database.tags import TagsTable
+
+
+# Schema migrations for Eddy database files, in order of application.
+# Database.Migrate() records the number of applied migrations in PRAGMA user_version.
+# New migrations must only be appended to MIGRATIONS.
+
+def _CreateTables(database):
+    # Files created before versioning already have these tables and are left untouched.
+    for table in (ItemsTable(database), TagsTable(database)):
+        if not table.Exists():
+            table.Clear()
+
+def _CreateTagsTable(database):
+    ItemsTable(database).CreateTagsTable()
+
+def _CreateSearchIndex(database):
+    ItemsTable(database).CreateSearchIndex()
+
+def _CreateIndexes(database):
+    ItemsTable(database).CreateIndexes()
+
+def _CreateDisplayCache(database):
+    ItemsTable(database).CreateDisplayCache()
+
+def _AddCollaborations(database):
+    ItemsTable(database).AddCollaborations()
+
+def _DropUnusedIndexes(database):
+    ItemsTable(database).DropUnusedIndexes()
+
+
+MIGRATIONS = (
+    _CreateTables,
+    _CreateTagsTable,
+    _CreateSearchIndex,
+    _CreateIndexes,
+    _CreateDisplayCache,
+    _AddCollaborations,
+    _DropUnusedIndexes
+)
@@ -12,11 +12,10 @@ from PySide2.QtWidgets import (
 
 from eddy.icons import icons
 from eddy.core.platform import OpenInFolder, OpenLocalDocument
+from eddy.database.items import ItemsTable
 
 
 class EditWidget(QWidget):
-    ItemUpdated = Signal()
-
     _KEYS = (
         "type",
         "title",
@@ -46,18 +45,8 @@ class EditWidget(QWidget):
         "files"
     )
 
-    _FORMAT_TYPE = {
-        "A": "Article",
-        "B": "Book",
-        "C": "Book Chapter",
-        "N": "Note",
-        "P": "Conference Proceedings",
-        "R": "Report",
-        "T": "Thesis"
-    }
-
     _FORMAT_FUNCTIONS = {
-        "type": lambda x: EditWidget._FORMAT_TYPE.get(x, ""),
+        "type": lambda x: ItemsTable.TYPES.get(x, ""),
         "authors": "\n".join,
         "editors": "\n".join,
         "isbns": "\n".join,
@@ -109,7 +98,7 @@ class EditWidget(QWidget):
         self._urls = LineSplitTextEdit(min_height)
         self._files = FileList()
 
-        for (k, v) in EditWidget._FORMAT_TYPE.items():
+        for (k, v) in ItemsTable.TYPES.items():
             self._type.addItem(v, k)
         # self._type.currentIndexChanged[int].connect(self._RefreshTypeFields)
 
@@ -283,8 +272,6 @@ class EditWidget(QWidget):
 
         self._table.EditRow(self._id, data)
 
-        self.ItemUpdated.emit()
-
     def _AddFile(self):
         files_dir = self._source.FilesDir()
         if files_dir is None:
@@ -312,7 +299,7 @@ class EditWidget(QWidget):
         data["files"].append(file_name)
 
         # Here self._updating is used to prevent calls to DisplayItem()
-        # triggered by an Updated() signal emitted by the database.
+        # triggered by the Changed() signal emitted by the table.
         self._updating = True
         self._table.EditRow(self._id, data)
         self._updating = False
@@ -324,7 +311,7 @@ class EditWidget(QWidget):
         data["files"] = [f for f in data["files"] if f != file_name]
 
         # Here self._updating is used to prevent calls to DisplayItem()
-        # triggered by an Updated() signal emitted by the database.
+        # triggered by the Changed() signal emitted by the table.
         self._updating = True
         self._table.EditRow(self._id, data)
         self._updating = False
@@ -348,9 +335,11 @@ class EditWidget(QWidget):
     def _SetTable(self, database_table):
         if self._table is not None:
             self._table.Cleared.disconnect(self.Clear)
+            self._table.Changed.disconnect(self._HandleChanges)
 
         self._table = database_table
         self._table.Cleared.connect(self.Clear)
+        self._table.Changed.connect(self._HandleChanges)
 
         # NOTE: Why do we need to receive the Cleared signal?
         #       Shouldn't the call to DisplayItem(-1) be enough?
@@ -363,6 +352,10 @@ class EditWidget(QWidget):
             self._files.setEnabled(True)
             self._files.SetFolder(self._source.FilesDir())
 
+    def _HandleChanges(self, changes):
+        if self._id in changes.updated:
+            self.DisplayItem()
+
     def Clear(self):
         self._scroll_widget.hide()
         self._scroll.verticalScrollBar().hide()
@@ -1,15 +1,15 @@
+from collections import OrderedDict
 from functools import partial
-import base64
+import json
 
 from PySide2.QtCore import Qt, Signal, QUrl
-from PySide2.QtWebEngineWidgets import QWebEngineView, QWebEnginePage
+from PySide2.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineProfile
 from PySide2.QtGui import QIcon, QCursor
-from PySide2.QtWidgets import QApplication, QMenu
+from PySide2.QtWidgets import QApplication, QMenu, QWidget, QVBoxLayout
 
 from eddy.core.web import WebSearch, INSPIRE_SOURCE
 from eddy.icons import icons
 from eddy.core.platform import ROOT_DIR, OpenWebURL, OpenLocalDocument, OpenOnlineDocument
-from eddy.core.documents import PNGFrontPageFromPDF
 from eddy.network import inspire, arxiv
 
 
@@ -21,15 +21,30 @@ class ItemPage(QWebEnginePage):
         str(ROOT_DIR / "extern" / "katex" / "_")
         ).toString(QUrl.FormattingOptions(QUrl.RemoveFilename))
 
+    # The page is loaded once, together with KaTeX. The content of each item is then
+    # replaced in place by ShowContent(), which renders the math in the new nodes only.
     _HEAD_KATEX = '''
         <link rel="stylesheet" href="katex.min.css">
-        <script defer src="katex.min.js"></script>
-        <script defer src="contrib/auto-render.min.js" onload="
-            renderMathInElement(document.body, {delimiters: [
-                {left: '$$', right: '$$', display: true},
-                {left: '$', right: '$', display: false}
-            ]});"></script>
+        <script>
+            function RenderMath(element) {
+                if (typeof renderMathInElement === "undefined") {
+                    // KaTeX is still loading, and will render the content once loaded
+                    return;
+                }
+                renderMathInElement(element, {delimiters: [
+                    {left: '$$', right: '$$', display: true},
+                    {left: '$', right: '$', display: false}
+                ]});
+            }
+            function ShowContent(html) {
+                const content = document.getElementById("content");
+                content.innerHTML = html;
+                RenderMath(content);
+            }
         </script>
+        <script defer src="katex.min.js"></script>
+        <script defer src="contrib/auto-render.min.js"
+            onload="RenderMath(document.getElementById('content'));"></script>
         <style>
             .katex {font-size: 1.0em !important;}
         </style>
@@ -102,10 +117,36 @@ class ItemPage(QWebEnginePage):
         "T": "THESIS"
     }
 
+    # Longer author lists are cut, with a button to show them in full
+    _MAX_AUTHORS = 50
+
+    _TEMPLATE = f'''
+        <!doctype html>
+        <html lang="en">
+        <head>
+            <meta charset="utf-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1">
+            {_HEAD_KATEX}
+            {_CSS_TEXT}
+            {_CSS_BUTTON}
+            {_CSS_COVER}
+        </head>
+        <body>
+        <div class="content" id="content"></div>
+        </body>
+        </html>
+    '''
+
     def __init__(self, parent=None):
-        super().__init__(parent)
+        super().__init__(_Profile(), parent)
         self.setBackgroundColor(Qt.transparent)
 
+        # Content to be shown once the page has loaded
+        self._loaded = False
+        self._pending = ""
+        self.loadFinished.connect(self._HandleLoadFinished)
+        self.setHtml(ItemPage._TEMPLATE, ItemPage._BASE_URL)
+
     def acceptNavigationRequest(self, url, type_, isMainFrame):
         if type_ is QWebEnginePage.NavigationType.NavigationTypeTyped:
             # This is the type_ associated with setHtml(). Only in this case, we honor the request.
@@ -117,9 +158,25 @@ class ItemPage(QWebEnginePage):
         return False
 
     def Clear(self):
-        self.setHtml("")
+        self.ShowHtml("")
 
-    def ShowPage(self, item):
+    def ShowPage(self, item, thumbnails=None, all_authors=False):
+        self.ShowHtml(ItemPage.Html(item, thumbnails, all_authors))
+
+    def ShowHtml(self, html):
+        # Replaces the content of the page, given as returned by Html().
+        if not self._loaded:
+            self._pending = html
+            return
+        self.runJavaScript(f"ShowContent({json.dumps(html)});")
+
+    def _HandleLoadFinished(self, ok):
+        self._loaded = True
+        self.ShowHtml(self._pending)
+        self._pending = ""
+
+    @staticmethod
+    def Html(item, thumbnails=None, all_authors=False):
         inspire_button = ItemPage._TopButton("inspire", path=item["inspire_id"])
         arxiv_button = ItemPage._TopButton("arxiv", path=item["arxiv_id"])
         links_button = ItemPage._TopButton("links", path=item["inspire_id"])
@@ -131,12 +188,21 @@ class ItemPage(QWebEnginePage):
 
         abstract = a if (a := item["abstract"]) is not None and item["type"] != "B" else ""
 
-        authors = (" ".join(a.split(", ", 1)[::-1]) for a in item["authors"])
-        author_bais = (b if b is not None else "" for b in item["authors_bais"])
-        author_button = (
+        n_authors = len(item["authors"])
+        shown = n_authors if all_authors else ItemPage._MAX_AUTHORS
+        authors = (" ".join(a.split(", ", 1)[::-1]) for a in item["authors"][:shown])
+        author_bais = (b if b is not None else "" for b in item["authors_bais"][:shown])
+        author_button = [
             f'''<button onclick="window.location.href='author:{a}/{b}';">{a}</button>'''
             for (a, b) in zip(authors, author_bais)
-        )
+        ]
+        if n_authors > shown:
+            author_button.append(
+                f'''<button onclick="window.location.href='expand:authors';">'''
+                f'''and {n_authors - shown} more</button>'''
+            )
+
+        collaborations = ", ".join(f"{c} Collaboration" for c in item["collaborations"])
 
         if (js := ItemPage._JournalString(item)) is not None:
             journal_button = (
@@ -148,38 +214,24 @@ class ItemPage(QWebEnginePage):
         if item["type"] == "B" and item["files"] != []:
             covers = [
                 f'<a href="file:{f}"><p>{i}</p></a>' for f in item["files"]
-                if (i := ItemPage._FrontCoverHTMLImage(f)) is not None
+                if (i := ItemPage._FrontCoverHTMLImage(f, thumbnails)) is not None
             ]
             covers = "".join(covers)
         else:
             covers = ""
 
         html = f'''
-            <!doctype html>
-            <html lang="en">
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1">
-                {ItemPage._HEAD_KATEX}
-                {ItemPage._CSS_TEXT}
-                {ItemPage._CSS_BUTTON}
-                {ItemPage._CSS_COVER}
-            </head>
-            <body>
-            <div class="content">
-                <p>{inspire_button}{arxiv_button}{links_button}{files_button}</p>
-                <p class="itemtype">{item_type}</p>
-                <h3>{title}</h3>
-                <p>{" ".join(author_button)}</p>
-                <p>{journal_button}</p>
-                <p align="justify">{abstract}</p>
-                <p>{covers}</p>
-            </div>
-            </body>
-            </html>
+            <p>{inspire_button}{arxiv_button}{links_button}{files_button}</p>
+            <p class="itemtype">{item_type}</p>
+            <h3>{title}</h3>
+            <p>{collaborations}</p>
+            <p>{" ".join(author_button)}</p>
+            <p>{journal_button}</p>
+            <p align="justify">{abstract}</p>
+            <p>{covers}</p>
         '''
 
-        self.setHtml(html, ItemPage._BASE_URL)
+        return html
 
     @staticmethod
     def _TopButton(scheme, path="", enabled=None):
@@ -214,23 +266,49 @@ class ItemPage(QWebEnginePage):
         return f"{item['publication']} {volume} {year} {issue} {pages}"
 
     @staticmethod
-    def _FrontCoverHTMLImage(file):
-        match file.suffix:
-            case ".pdf":
-                try:
-                    cover_png = PNGFrontPageFromPDF(file)
-                except:
-                    return None
-            case ".djvu":
-                return None
-            case _:
-                return None
+    def _FrontCoverHTMLImage(file, thumbnails):
+        # Covers are served from the thumbnail cache, and left out until generated.
+        if thumbnails is None or (thumbnail := thumbnails.Thumbnail(file)) is None:
+            return None
+        return f'<img src="{QUrl.fromLocalFile(str(thumbnail)).toString()}" class="cover">'
+
+
+_PROFILE = None
+
+def _Profile():
+    # A single off-the-record profile is shared by the item pages, and created on first use.
+    global _PROFILE
+
+    if _PROFILE is None:
+        _PROFILE = QWebEngineProfile(QApplication.instance())
+    return _PROFILE
+
+
+# The web view showing the item page, created when an ItemView is first shown.
+# It is shared by all the ItemView objects, and moved into the one last shown.
+_BROWSER = None
+_BORROWER = None
+
+def _Browser():
+    global _BROWSER
 
-        cover_png_base64 = base64.b64encode(cover_png).decode("utf-8")
-        return f'<img src="data:image/png;base64,{cover_png_base64}" class="cover">'
+    if _BROWSER is None:
+        _BROWSER = QWebEngineView()
+        _BROWSER.setAttribute(Qt.WA_TranslucentBackground)
+        _BROWSER.setStyleSheet("background:transparent")
 
+        _BROWSER.setContextMenuPolicy(Qt.PreventContextMenu)
+
+        _BROWSER.setPage(ItemPage(_BROWSER))
+    return _BROWSER
+
+
+class ItemView(QWidget):
+    ''' Shows an item, in the web view shared with the other ItemView objects.
+        While the view is elsewhere, the displayed item is only recorded, and it is shown
+        once the view is borrowed back.
+    '''
 
-class ItemView(QWebEngineView):
     NewTabRequested = Signal(WebSearch)
 
     _KEYS = (
@@ -238,6 +316,7 @@ class ItemView(QWebEngineView):
         "title",
         "authors",
         "authors_bais",
+        "collaborations",
         # "editors",
         # "editors_bais",
         "abstract",
@@ -262,71 +341,171 @@ class ItemView(QWebEngineView):
         "files"
     )
 
+    # Number of prefetched pages kept while waiting for their item to be selected
+    _PREFETCH_SIZE = 8
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setStyleSheet("background:transparent")
 
         self._source = None
         self._table = None
+        self._thumbnails = None
         self._id = -1
 
-        self.setContextMenuPolicy(Qt.PreventContextMenu)
-        # To have a custom context menu one should reimplement contextMenuEvent as below
+        # The page of the shared web view, while it is borrowed
+        self._page = None
 
-        self._page = ItemPage()
-        self._page.ButtonClicked.connect(self._HandleButtonClicked)
-        self._page.Clear()
-        self.setPage(self._page)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
 
         self._item = None
+        # Whether the complete list of authors of the item is shown
+        self._all_authors = False
+        # Maps ids to the HTML of their pages, rendered ahead of selection
+        self._prefetched = OrderedDict()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._Borrow()
+
+    def _Borrow(self):
+        global _BORROWER
+
+        if _BORROWER is self:
+            return
+        if _BORROWER is not None:
+            _BORROWER._Return()
+
+        browser = _Browser()
+        _BORROWER = self
+        self.layout().addWidget(browser)
+        browser.show()
+        self._page = browser.page()
+        self._page.ButtonClicked.connect(self._HandleButtonClicked)
+        self._Show()
 
-    # def contextMenuEvent(self, event):
-    #     self.menu = self.page().createStandardContextMenu()
-    #     self.menu.addAction(str(event.pos()))
-    #     self.menu.popup(event.globalPos())
+    def _Return(self):
+        self._page.ButtonClicked.disconnect(self._HandleButtonClicked)
+        self._page = None
+
+    def Release(self):
+        # Gives up the shared web view, which must be done before the object is deleted.
+        global _BORROWER
+
+        if _BORROWER is not self:
+            return
+
+        self._Return()
+        _BORROWER = None
+        # The view is hidden by losing its parent.
+        _Browser().setParent(None)
 
     def SetLocalSource(self, source):
         if self._source == source:
             return
 
         self._source = source
-        # if self._table is not None:
-        #     self._table.Updated.disconnect(self.DisplayItem)
-        self._table = source.table
-        # self._table.Updated.connect(self.DisplayItem)
+        self._SetTable(source.table)
+        self._SetThumbnails(source.Thumbnails())
 
     def SetTable(self, database_table):
         if self._table == database_table:
             return
 
         self._source = None
-        # if self._table is not None:
-        #     self._table.Updated.disconnect(self.DisplayItem)
+        self._SetTable(database_table)
+        self._SetThumbnails(None)
+
+    def _SetTable(self, database_table):
+        if self._table is not None:
+            self._table.Changed.disconnect(self._HandleChanges)
         self._table = database_table
-        # self._table.Updated.connect(self.DisplayItem)
+        self._table.Changed.connect(self._HandleChanges)
+        self._prefetched.clear()
+        # The displayed id belongs to the previous table.
+        self.DisplayItem(-1)
+
+    def _SetThumbnails(self, thumbnails):
+        if self._thumbnails is not None:
+            # The cache belongs to the source, and may still be generating thumbnails.
+            self._thumbnails.ThumbnailReady.disconnect(self._HandleThumbnailReady)
+        self._thumbnails = thumbnails
+        if self._thumbnails is not None:
+            self._thumbnails.ThumbnailReady.connect(self._HandleThumbnailReady)
+
+    def _HandleThumbnailReady(self, file):
+        # Prefetched pages may lack the new cover, and are rendered again when needed.
+        self._prefetched.clear()
+        if self._page is not None and self._id != -1 and file in self._item["files"]:
+            self._page.ShowPage(self._item, self._thumbnails, self._all_authors)
+
+    def _HandleChanges(self, changes):
+        if changes.reset:
+            self._prefetched.clear()
+        for id_ in (*changes.updated, *changes.deleted):
+            self._prefetched.pop(id_, None)
+
+        if self._id in changes.deleted:
+            self.DisplayItem(-1)
+        elif self._id in changes.updated:
+            self.DisplayItem(self._id)
 
     def DisplayItem(self, id_):
         # NOTE: When self._id == id_, we do not skip this function.
-        #       In fact, it means that the item was updated and TableView has emitted an
-        #       ItemSelected() signal as the result of a model reset triggere by an
-        #       Updated() signal from the associated Table.
-        #       This method is not quite robust, though, since it relies on the fact that
-        #       we are resetting the model for every database update which is not the right
-        #       way of dealing with this.
-        #       Furthermore, it seems that every Update() triggers two consecutive
-        #       ItemSelected() signals. Can we avoid this?
+        #       In fact, it means either that the item was updated, and _HandleChanges()
+        #       requested a refresh, or that TableView has restored its selection after
+        #       a model reset or a layout change.
 
+        if self._id != id_:
+            self._all_authors = False
         self._id = id_
+        self._Show()
+
+    def _Show(self):
+        if self._page is None:
+            return
+
+        if self._id != -1:
+            try:
+                self._item = self._Item(self._id)
+            except KeyError:
+                # The item has been deleted meanwhile
+                self._id = -1
 
         if self._id == -1:
+            self._item = None
             self._page.Clear()
             return
 
-        self._item = self._table.GetRow(self._id, self._KEYS)
-        self._item["files"] = [self._source.FilesDir() / f for f in self._item["files"]]
+        html = self._prefetched.pop(self._id, None)
+        if html is not None and not self._all_authors:
+            self._page.ShowHtml(html)
+        else:
+            self._page.ShowPage(self._item, self._thumbnails, self._all_authors)
+
+    def Prefetch(self, ids):
+        # Loads and renders the pages of items likely to be selected next,
+        # so that they are shown at once if they are.
+        if self._table is None:
+            return
 
-        self._page.ShowPage(self._item)
+        for id_ in ids:
+            if id_ in self._prefetched:
+                self._prefetched.move_to_end(id_)
+                continue
+            try:
+                self._prefetched[id_] = ItemPage.Html(self._Item(id_), self._thumbnails)
+            except KeyError:
+                # The item has been deleted meanwhile
+                continue
+            if len(self._prefetched) > ItemView._PREFETCH_SIZE:
+                self._prefetched.popitem(last=False)
+
+    def _Item(self, id_):
+        item = self._table.GetRow(id_, self._KEYS)
+        item["files"] = [self._source.FilesDir() / f for f in item["files"]]
+        return item
 
     def _HandleButtonClicked(self, url):
         match url.scheme():
@@ -344,6 +523,9 @@ class ItemView(QWebEngineView):
                 OpenLocalDocument(url.path())
             case "files":
                 self._ShowFilesContextMenu()
+            case "expand":
+                self._all_authors = True
+                self._page.ShowPage(self._item, self._thumbnails, self._all_authors)
             case _:
                 pass
 
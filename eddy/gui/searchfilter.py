@@ -67,7 +67,7 @@ class FilterBar(QLineEdit):
         super().__init__(parent)
 
         self.setClearButtonEnabled(True)
-        self.setPlaceholderText("Filter authors and titles")
+        self.setPlaceholderText("Filter authors, titles and abstracts")
         self.textChanged.connect(self._HandleTextChanged)
         self.addAction(QIcon(icons.FILTER), QLineEdit.LeadingPosition)
 
@@ -56,12 +56,22 @@ class SourceModel(QStandardItemModel):
                 self[s.name] = i
                 self[p].setChild(r, i)
 
-        for (r, (n, p)) in enumerate(LOCAL_DATABASES.items()):
+        for (r, (n, d)) in enumerate(LOCAL_DATABASES.items()):
+            # Each entry is either a file name or a dictionary with a "file" key
+            # and, optionally, connection settings overriding database.DEFAULT_PROFILE.
+            match d:
+                case dict():
+                    profile = {k: v for (k, v) in d.items() if k != "file"}
+                    p = d.get("file", "")
+                case _:
+                    profile = None
+                    p = d
+
             if not Path(p).is_file():
                 print(f"Error: Cannot find database file {p}")
                 continue
 
-            s = LocalSource(n, p)
+            s = LocalSource(n, p, profile)
             i = SourceModel._CreateItemFromData(s)
             local.setChild(r, i)
             SourceModel._AppendTags(i)
@@ -1,8 +1,14 @@
-from PySide2.QtCore import Signal, QSize
+from pathlib import Path
+import gzip
+import json
+import os
+import tempfile
+
+from PySide2.QtCore import Signal, QSize, QTimer
 from PySide2.QtGui import Qt, QIcon
 from PySide2.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QSplitter, QTabWidget, QStatusBar, QProgressBar,
-    QSizePolicy, QToolButton, QLabel
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QSplitter, QTabWidget, QStatusBar,
+    QProgressBar, QSizePolicy, QToolButton, QLabel
 )
 
 from config import LEFT_PANEL_WIDTH
@@ -24,6 +30,12 @@ class TabContent(QWidget):
     NewTabRequested = Signal(WebSearch)
     TitleRequested = Signal((str, str), ())
 
+    # A tab inactive for this long hibernates: its search results are moved to a compressed
+    # file and removed from the memory database, until the tab is activated again.
+    _HIBERNATION_DELAY = 10 * 60 * 1000     # In milliseconds
+    # Delay after a change of the results before the memory they take is measured again
+    _MEMORY_DELAY = 1000                    # In milliseconds
+
     def __init__(self, index, source_model, memory_database, parent=None):
         super().__init__(parent)
 
@@ -32,6 +44,16 @@ class TabContent(QWidget):
 
         self._last_search = None
 
+        # The file holding the search results while the tab hibernates,
+        # and the ones that were selected, if they were shown
+        self._spill_file = None
+        self._spill_selection = []
+        self._hibernation_timer = QTimer(self)
+        self._hibernation_timer.setSingleShot(True)
+        self._hibernation_timer.setInterval(TabContent._HIBERNATION_DELAY)
+        self._hibernation_timer.timeout.connect(self._Hibernate)
+        QApplication.instance().aboutToQuit.connect(self._DiscardSpillFile)
+
         self._fetcher = Fetcher()
         self._fetcher.FetchingStarted.connect(self._HandleFetchingStarted)
         self._fetcher.BatchReady.connect(self._database_table.AddData)
@@ -61,6 +83,17 @@ class TabContent(QWidget):
         self._status_bar.addPermanentWidget(self._search_status_bar)
         self._fetcher.BatchProgress.connect(self._search_status_bar.SetProgress)
 
+        self._memory_label = QLabel()
+        self._memory_label.setToolTip("Memory taken by the search results of this tab")
+        self._status_bar.addPermanentWidget(self._memory_label)
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setSingleShot(True)
+        self._memory_timer.setInterval(TabContent._MEMORY_DELAY)
+        self._memory_timer.timeout.connect(self._UpdateMemory)
+        self._database_table.Updated.connect(self._memory_timer.start)
+        self._database_table.Cleared.connect(self._memory_timer.start)
+        self._UpdateMemory()
+
         self._active_source = None
         self._source_panel.SelectSource(INSPIRE_SOURCE)
 
@@ -103,6 +136,97 @@ class TabContent(QWidget):
     def StopFetching(self):
         self._fetcher.Stop()
 
+    def Close(self):
+        # Prepares the tab for deletion.
+        self.StopFetching()
+        self._splitter.item_view.Release()
+        self._hibernation_timer.stop()
+        self._DiscardSpillFile()
+
+    def SetActive(self, active):
+        if active:
+            self._hibernation_timer.stop()
+            self._Restore()
+        elif self._spill_file is None and not self._hibernation_timer.isActive():
+            self._hibernation_timer.start()
+
+    def _Hibernate(self):
+        if self._fetcher.IsFetching():
+            # The results are still coming, so we try again later.
+            self._hibernation_timer.start()
+            return
+
+        records = self._database_table.GetTable()
+        if records == []:
+            return
+
+        (handle, name) = tempfile.mkstemp(prefix="eddy-tab-", suffix=".json.gz")
+        os.close(handle)
+        self._spill_file = Path(name)
+        try:
+            with gzip.open(self._spill_file, "wt", encoding="utf-8") as f:
+                json.dump(records, f)
+        except OSError as e:
+            print(f"Warning: Could not write the results of the tab to '{name}': {e}")
+            self._DiscardSpillFile()
+            return
+
+        if isinstance(self._active_source, WebSource):
+            self._spill_selection = self._splitter.table_view.SelectedIds()
+        self._database_table.Clear()
+        self._UpdateMemory()
+
+    def _Restore(self):
+        if self._spill_file is None:
+            return
+
+        try:
+            with gzip.open(self._spill_file, "rt", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read the results of the tab from '{self._spill_file}': {e}")
+            records = []
+        self._DiscardSpillFile()
+
+        # The items keep their ids, and are inserted in their original order.
+        self._database_table.UpsertData(records)
+        if self._spill_selection != []:
+            self._splitter.table_view.SelectIds(self._spill_selection)
+            self._spill_selection = []
+
+    def _DiscardSpillFile(self):
+        if self._spill_file is None:
+            return
+
+        try:
+            self._spill_file.unlink(missing_ok=True)
+        except OSError:
+            pass
+        self._spill_file = None
+        self._UpdateMemory()
+
+    def _UpdateMemory(self):
+        if self._spill_file is not None:
+            try:
+                size = self._spill_file.stat().st_size
+            except OSError:
+                self._memory_label.setText("Hibernated")
+                return
+            self._memory_label.setText(f"Hibernated ({TabContent._FormatSize(size)} on disk)")
+            return
+
+        size = self._database_table.Size()
+        if size is None:
+            self._memory_label.hide()
+            return
+        self._memory_label.setText(TabContent._FormatSize(size))
+
+    @staticmethod
+    def _FormatSize(size):
+        if size < 1024 * 1024:
+            return f"{size / 1024:.0f} KB"
+        return f"{size / (1024 * 1024):.1f} MB"
+
     def _HandleWebSourceSelected(self, source):
         if self._last_search is None:
             self._splitter.table_view.SetShowCitations(source.has_cites)
@@ -175,18 +299,37 @@ class TabContent(QWidget):
         match total:
             case 0:
                 self._status_bar.showMessage("0 items")
+                self._status_bar.setToolTip("")
                 return
             case 1:
                 message = f"1 item, {len(selected_ids)} selected"
             case _:
                 message = f"{total} items, {len(selected_ids)} selected"
 
+        tooltip = ""
         if selected_ids != []:
             if isinstance(self._active_source, WebSource) and self._last_search.source.has_cites:
-                citations = self._database_table.GetTotalCitations(selected_ids)
-                message = f"{message} ({citations} citations among selected)"
+                statistics = self._database_table.GetStatistics(selected_ids)
+                message = (
+                    f"{message} ({statistics['citations']} citations, "
+                    f"h-index {statistics['h_index']} among selected)"
+                )
+                tooltip = TabContent._FormatStatistics(statistics)
 
         self._status_bar.showMessage(message)
+        self._status_bar.setToolTip(tooltip)
+
+    @staticmethod
+    def _FormatStatistics(statistics):
+        # Breakdown of the selected items by year and by type.
+        years = sorted(statistics["years"].items(), key=lambda x: (x[0] is None, x[0] or ""))
+        types = sorted(statistics["types"].items(), key=lambda x: -x[1])
+        lines = [f"{y if y is not None else 'No date'}: {n}" for (y, n) in years]
+        lines.append("")
+        lines.extend(
+            f"{ItemsTable.TYPES.get(t, 'Unknown type')}: {n}" for (t, n) in types
+        )
+        return "\n".join(lines)
 
 
 class TableItemSplitter(QSplitter):
@@ -198,24 +341,28 @@ class TableItemSplitter(QSplitter):
         self.table_view = TableView()
         self.table_view.setModel(self.table_model)
 
-        property_tab = QTabWidget()
-        property_tab.setDocumentMode(True)
+        self._property_tab = QTabWidget()
+        self._property_tab.setDocumentMode(True)
 
         self.item_view = ItemView()
         self.edit_widget = EditWidget()
         self.bibtex_widget = BibTeXWidget()
-        self.table_view.ItemSelected.connect(self.item_view.DisplayItem)
-        self.table_view.ItemSelected.connect(self.edit_widget.DisplayItem)
-        self.table_view.ItemSelected.connect(self.bibtex_widget.DisplayItem)
-        self.edit_widget.ItemUpdated.connect(self.table_model.Update)
 
-        property_tab.addTab(self.item_view, "Item")
-        property_tab.addTab(self.edit_widget, "Edit")
-        property_tab.addTab(self.bibtex_widget, "BibTeX")
+        self._property_tab.addTab(self.item_view, "Item")
+        self._property_tab.addTab(self.edit_widget, "Edit")
+        self._property_tab.addTab(self.bibtex_widget, "BibTeX")
+
+        # Only the widget in the current property tab follows the selection.
+        # The others are marked as outdated, and display the selected item once shown.
+        self._selected_id = -1
+        self._outdated = set()
+        self.table_view.ItemSelected.connect(self._DisplayItem)
+        self.table_view.PrefetchRequested.connect(self._Prefetch)
+        self._property_tab.currentChanged.connect(self._HandleCurrentChanged)
 
         self.setHandleWidth(4)
         self.addWidget(self.table_view)
-        self.addWidget(property_tab)
+        self.addWidget(self._property_tab)
         self.setStretchFactor(0, 5)
         self.setStretchFactor(1, 2)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -233,6 +380,25 @@ class TableItemSplitter(QSplitter):
         self.edit_widget.SetLocalSource(source)
         self.bibtex_widget.SetTable(source.table)
 
+    def _DisplayItem(self, id_):
+        self._selected_id = id_
+        current = self._property_tab.currentWidget()
+        for w in (self.item_view, self.edit_widget, self.bibtex_widget):
+            if w is current:
+                w.DisplayItem(id_)
+            else:
+                self._outdated.add(w)
+
+    def _Prefetch(self, ids):
+        if self._property_tab.currentWidget() is self.item_view:
+            self.item_view.Prefetch(ids)
+
+    def _HandleCurrentChanged(self, index):
+        widget = self._property_tab.widget(index)
+        if widget in self._outdated:
+            self._outdated.discard(widget)
+            widget.DisplayItem(self._selected_id)
+
 
 class SearchStatus(QWidget):
     def __init__(self, parent=None):
@@ -290,13 +456,16 @@ class TabSystem(QTabWidget):
         # self.setFocusPolicy(Qt.NoFocus)
 
         self._source_model = SourceModel()
-        self._memory_database = Database()
+        # Space freed by the tables of closed or hibernating tabs is returned at once.
+        self._memory_database = Database(profile={"auto_vacuum": "FULL"})
+
+        self.currentChanged.connect(self._HandleCurrentChanged)
 
         self._index = 0
 
     def _CloseTab(self, index):
         content = self.widget(index)
-        content.StopFetching()
+        content.Close()
         content.deleteLater()
 
         self.removeTab(index)
@@ -306,6 +475,10 @@ class TabSystem(QTabWidget):
         else:
             self.currentWidget().setFocus()
 
+    def _HandleCurrentChanged(self, index):
+        for i in range(self.count()):
+            self.widget(i).SetActive(i == index)
+
     def CloseCurrentTab(self):
         self._CloseTab(self.currentIndex())
 
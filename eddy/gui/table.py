@@ -1,71 +1,110 @@
+from array import array
+from collections import OrderedDict
 from functools import partial
+import bisect
+import html
 import json
+import re
+import sys
+import unicodedata
 from datetime import datetime
 
-try:
-    from pylatexenc.latex2text import LatexNodes2Text
-    HAS_PYLATEXENC = True
-except ImportError:
-    HAS_PYLATEXENC = False
-
 from PySide2.QtCore import (
-    Qt, Signal, QAbstractItemModel, QItemSelection, QItemSelectionModel, QModelIndex, QMimeData,
-    QByteArray
+    Qt, Signal, QTimer, QAbstractItemModel, QItemSelection, QItemSelectionModel, QModelIndex,
+    QMimeData, QByteArray
 )
 from PySide2.QtGui import QIcon, QDrag
 from PySide2.QtWidgets import QAbstractItemView, QTreeView, QHeaderView, QMenu, QLabel
 
 from eddy.icons import icons
 from eddy.core.web import INSPIRE_SOURCE
+from eddy.core.latex import LatexToTextMany
 from eddy.core.platform import OpenLocalDocument, OpenOnlineDocument, OpenWebURL
-from eddy.database.items import SortBy
+from eddy.database.items import SortBy, ItemsTable
+from eddy.database.background import BackgroundQuery
 from eddy.network import inspire, arxiv
 
 
 class TableData:
     ''' Presents the data in ItemsTable in a convenient way to be consumed by TreeModel.
-        NOTE: an TableData object should be discarded every time ItemsTable is updated!
+        Only the ids, and the sort keys once they are needed, are loaded for all the items.
+        The rows are formatted a page at a time when first accessed, and the most recently
+        used ones are kept in a column-oriented store.
+        NOTE: changes to ItemsTable are not tracked automatically, but must be incorporated
+              with Refresh() and Discard(), while the rows to be shown are set with SetIds().
     '''
 
-    _KEYS = (
-        "id",
-        "date",
+    # Keys from which the title and authors columns are rendered
+    _DISPLAY_KEYS = (
         "authors",
         "editors",
-        "title",
-        "citations"
+        "collaborations",
+        "title"
     )
 
+    # Longer author lists are cut in the Authors column, and given in full by its tooltip.
+    _MAX_AUTHORS = 10
+
+    # Number of consecutive rows formatted together
+    PAGE_SIZE = 200
+    # Number of formatted rows kept in memory
+    _CACHE_SIZE = 50 * PAGE_SIZE
+
+    # Index of the citations column, where missing values are stored as -1
+    _CITATIONS = 3
+
     def __init__(self, table):
         self._table = table
 
         self._ids = []      # Maps a row index to the correspoding id
-        self._row_map = []  # Maps a row index to the row index in raw_data
+        self._rows = None   # Maps an id to its row index, built from _ids when needed
+
+        # The ids of the items in _table, in order of loading, with the sort keys aligned to
+        # them as {key: column}. A column is loaded when sorting by its key for the first time.
+        # The index of each live id is in _ids_dict, while deleted ones are left in place.
+        self._raw_ids = []
+        self._ids_dict = {}
+        self._sort_columns = {}
+
+        # Indices in _raw_ids of the live ids sorted by the given key, as {(key, order): list}.
+        # They are dropped whenever the data changes.
+        self._permutations = {}
+
+        # The filter strings and tags last queried, with the set of ids matching them.
+        self._matching_filters = None
+        self._matching_ids = None
+
+        # Normalized text of the search columns of some ids, see _Refine().
+        self._haystacks = {}
+
+        # Formatted rows, stored by column as [date, authors/editors, title, citations].
+        # Each row cached occupies a slot in the columns, and _slots maps its id to the slot,
+        # from the least to the most recently used. Dates and authors, which are often
+        # repeated, are interned.
+        self._columns = (
+            [None] * TableData._CACHE_SIZE,
+            [None] * TableData._CACHE_SIZE,
+            [None] * TableData._CACHE_SIZE,
+            array("q", [-1]) * TableData._CACHE_SIZE
+        )
+        self._slots = OrderedDict()
+        self._free_slots = list(range(TableData._CACHE_SIZE))
 
         if self._table is None:
-            self.raw_data = [[]]
-            self._ids_dict = {}
             return
 
-        data = table.GetTable(TableData._KEYS)
-
-        # The unsorted and unfiltered data in _table, with structure
-        # [date, authors/editors, title, citations]
-        self.raw_data = [[
-            d["date"],
-            TableData._FormatAuthors(d["authors"] + d["editors"]),
-            TableData._FormatTitle(t if (t := d["title"]) is not None else ""),
-            d["citations"]
-        ] for d in data]
-
-        # Maps an id to the corresponding row index in raw_data
-        self._ids_dict = dict((v, i) for i, v in enumerate([d["id"] for d in data]))
+        # The ids are loaded in order of date, the default sorting, by a scan of its index.
+        # The column of the dates comes with them, and sorting by it is then linear.
+        data = self._table.GetTable(("id", "date"), sort_by=SortBy("date", SortBy.ASCENDING))
+        self._raw_ids = [d["id"] for d in data]
+        self._ids_dict = dict((v, i) for i, v in enumerate(self._raw_ids))
+        self._sort_columns["date"] = [v if (v := d["date"]) is not None else "" for d in data]
 
     def __len__(self):
-        return len(self._row_map)
+        return len(self._ids)
 
     def __getitem__(self, position):
-        return TableRow(self._row_map[position], self._ids[position], self)
+        return TableRow(position, self._ids[position], self)
 
     @property
     def table(self):
@@ -75,38 +114,360 @@ class TableData:
     def ids(self):
         return self._ids
 
-    def SortFilter(self, sort_by, filter_strings, tags):
-        if self._table is None:
+    def Row(self, id_):
+        # Returns the row index of id_, or None if it is not shown.
+        if self._rows is None:
+            self._rows = {i: r for (r, i) in enumerate(self._ids)}
+        return self._rows.get(id_, None)
+
+    def Cell(self, position, column):
+        # Returns the formatted value in a cell, loading the page containing it if needed.
+        id_ = self._ids[position]
+        if (slot := self._slots.get(id_, None)) is None:
+            self._LoadPage(position)
+            slot = self._slots[id_]
+        else:
+            self._slots.move_to_end(id_)
+
+        value = self._columns[column][slot]
+        if column == TableData._CITATIONS and value == -1:
+            return None
+        return value
+
+    def AuthorsToolTip(self, position):
+        # Returns the complete list of authors for the rows where it is cut, None otherwise.
+        data = self._table.GetRow(self._ids[position], ("authors", "editors"))
+        authors = data["authors"] + data["editors"]
+        if len(authors) <= TableData._MAX_AUTHORS:
+            return None
+        # Rich text is wrapped by the tooltip.
+        return f"<p>{html.escape(TableData._Surnames(authors))}</p>"
+
+    def _LoadPage(self, position):
+        start = position - position % TableData.PAGE_SIZE
+        page = [i for i in self._ids[start:start + TableData.PAGE_SIZE] if i not in self._slots]
+
+        (dates, authors, titles, citations) = self._columns
+        for (i, (d, a, t, c)) in zip(page, self._Load(page)):
+            if self._free_slots != []:
+                slot = self._free_slots.pop()
+            else:
+                (_, slot) = self._slots.popitem(last=False)
+            self._slots[i] = slot
+            dates[slot] = sys.intern(d) if d is not None else None
+            authors[slot] = sys.intern(a)
+            titles[slot] = t
+            citations[slot] = c if c is not None else -1
+
+    def _DropSlot(self, id_):
+        if (slot := self._slots.pop(id_, None)) is not None:
+            self._free_slots.append(slot)
+
+    def Refresh(self, ids):
+        # Reloads the data of the given ids from _table, adding the items that are new.
+        ids = list(ids)
+        for i in ids:
+            if i not in self._ids_dict:
+                self._ids_dict[i] = len(self._raw_ids)
+                self._raw_ids.append(i)
+            self._DropSlot(i)
+            self._haystacks.pop(i, None)
+
+        for (k, column) in self._sort_columns.items():
+            for (i, v) in zip(ids, self._SortValues(k, ids)):
+                if (index := self._ids_dict[i]) == len(column):
+                    column.append(v)
+                else:
+                    column[index] = v
+
+        self._permutations = {}
+        self._UpdateMatching(ids)
+
+    def Discard(self, ids):
+        # Forgets the given ids, which have been deleted from _table.
+        for i in ids:
+            self._ids_dict.pop(i, None)
+            if self._matching_ids is not None:
+                self._matching_ids.discard(i)
+            self._DropSlot(i)
+            self._haystacks.pop(i, None)
+        self._permutations = {}
+
+    def _Load(self, ids):
+        # Returns the formatted rows of the given ids.
+        data = self._table.GetRows(ids, ("date", "citations"))
+        display = self._Display(ids)
+        return [
+            [d["date"], display[i][1], display[i][0], d["citations"]] for (i, d) in zip(ids, data)
+        ]
+
+    def _Display(self, ids):
+        # Returns the rendered titles and authors as {id: (title, authors)}.
+        # They are taken from the display cache of _table, where the missing ones are stored.
+        display = self._table.GetDisplay(ids)
+        missing = [i for i in ids if i not in display]
+        if missing != []:
+            rendered = dict(zip(
+                missing,
+                TableData._FormatDisplay(self._table.GetRows(missing, TableData._DISPLAY_KEYS))
+            ))
+            self._table.SetDisplay(rendered)
+            display.update(rendered)
+        return display
+
+    def _SortValues(self, key, ids):
+        # Returns the sort keys of the given ids. Missing values sort first, as NULL in SQLite.
+        match key:
+            case "date" | "citations":
+                default = "" if key == "date" else -1
+                data = self._table.GetRows(ids, (key,))
+                return [v if (v := d[key]) is not None else default for d in data]
+            case "authors" | "title":
+                display = self._Display(ids)
+                n = 0 if key == "title" else 1
+                return [TableData._NormalizeText(display[i][n]) for i in ids]
+
+    def _Column(self, key):
+        if (column := self._sort_columns.get(key, None)) is None:
+            # Deleted ids are given the key of a missing value.
+            column = [-1 if key == "citations" else ""] * len(self._raw_ids)
+            live_ids = list(self._ids_dict)
+            for (i, v) in zip(live_ids, self._SortValues(key, live_ids)):
+                column[self._ids_dict[i]] = v
+            if key == "citations":
+                column = array("q", column)
+            self._sort_columns[key] = column
+        return column
+
+    @staticmethod
+    def _NormalizeText(text):
+        # Compares texts ignoring case and diacritics.
+        text = unicodedata.normalize("NFKD", text)
+        return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+    def _KeyFunction(self, key):
+        # Returns the function mapping an index in _raw_ids to its sort key for key.
+        # Ties are broken by id.
+        column = self._Column(key)
+        raw_ids = self._raw_ids
+        return lambda i: (column[i], raw_ids[i])
+
+    def _Permutation(self, sort_by):
+        # Returns the indices in _raw_ids of all the live ids, in the given order.
+        if (permutation := self._permutations.get((sort_by.key, sort_by.order), None)) is None:
+            reverse = (sort_by.key, SortBy.ASCENDING if sort_by.order == SortBy.DESCENDING
+                       else SortBy.DESCENDING)
+            if (permutation := self._permutations.get(reverse, None)) is not None:
+                permutation = permutation[::-1]
+            else:
+                permutation = sorted(
+                    self._ids_dict.values(), key=self._KeyFunction(sort_by.key),
+                    reverse=sort_by.order == SortBy.DESCENDING
+                )
+            self._permutations[(sort_by.key, sort_by.order)] = permutation
+        return permutation
+
+    def _Matching(self, filter_strings, tags):
+        # Returns the set of ids matching the filters, or None if there are no filters.
+        # The result is kept until the filters change. When they only narrow the previous
+        # ones, as while typing a word, the previous result is refined in memory.
+        filters = (tuple(filter_strings), tuple(tags))
+        if filters == ((), ()):
+            return None
+
+        if filters != self._matching_filters:
+            if self._Refines(filters):
+                self._matching_ids = self._Refine(self._matching_ids, filter_strings)
+            else:
+                data = self._table.GetTable(("id",), None, filter_strings, tags)
+                self._matching_ids = {d["id"] for d in data}
+            self._matching_filters = filters
+            self._PruneHaystacks()
+        return self._matching_ids
+
+    def CanMatch(self, filter_strings, tags):
+        # Whether the ids matching the filters can be found without querying _table.
+        filters = (tuple(filter_strings), tuple(tags))
+        return filters in (((), ()), self._matching_filters) or self._Refines(filters)
+
+    def SetMatching(self, filter_strings, tags, ids):
+        # Sets the ids matching the filters, as found by querying _table elsewhere.
+        self._matching_filters = (tuple(filter_strings), tuple(tags))
+        self._matching_ids = set(ids)
+        self._PruneHaystacks()
+
+    def _PruneHaystacks(self):
+        # Only the ids matching the filters last queried can be refined further,
+        # so that at most _REFINE_LIMIT haystacks are kept.
+        self._haystacks = {
+            i: h for (i, h) in self._haystacks.items() if i in self._matching_ids
+        }
+
+    def _Refines(self, filters):
+        # Whether every id matching filters also matches the filters last queried.
+        # This holds if the tags are the same and each previous word is implied by a new one,
+        # that is if its phrase is contained in the phrase of a new word.
+        if (self._matching_ids is None or len(self._matching_ids) > TableData._REFINE_LIMIT
+                or not self._table.HasSearchIndex()):
+            return False
+
+        ((old_strings, old_tags), (new_strings, new_tags)) = (self._matching_filters, filters)
+        if old_tags != new_tags:
+            return False
+
+        new_phrases = TableData._SearchPhrases(new_strings)
+        return all(any(p in q for q in new_phrases) for p in TableData._SearchPhrases(old_strings))
+
+    def _Refine(self, ids, filter_strings):
+        # Returns the ids whose haystack contains the phrase of every word.
+        phrases = TableData._SearchPhrases(filter_strings)
+
+        missing = [i for i in ids if i not in self._haystacks]
+        for (i, d) in zip(missing, self._table.GetRows(missing, ItemsTable.SEARCH_KEYS)):
+            self._haystacks[i] = TableData._Haystack(d)
+
+        return {i for i in ids if all(p in self._haystacks[i] for p in phrases)}
+
+    # Above this number of ids, refining in memory costs more than querying the search index.
+    _REFINE_LIMIT = 20000
+
+    # The methods below mimic the unicode61 tokenizer of the search index, which folds case,
+    # removes diacritics and splits on anything but letters and digits. A word is matched by
+    # the index as a phrase whose last token is a prefix, so that the haystack of an item
+    # contains the phrase of every word that it matches. Columns are separated by "\0",
+    # which prevents phrases from spanning two of them.
+
+    @staticmethod
+    def _Tokens(text):
+        return re.findall(r"[^\W_]+", TableData._NormalizeText(text))
+
+    @staticmethod
+    def _SearchPhrases(filter_strings):
+        # Words without tokens are dropped, as in ItemsTable.
+        return [" " + " ".join(t) for f in filter_strings if (t := TableData._Tokens(f)) != []]
+
+    @staticmethod
+    def _Haystack(data):
+        columns = (
+            json.dumps(v) if isinstance(v := data[k], list) else (v if v is not None else "")
+            for k in ItemsTable.SEARCH_KEYS
+        )
+        return "\0".join(" " + " ".join(TableData._Tokens(c)) for c in columns)
+
+    def _UpdateMatching(self, ids):
+        # Tests again the filters last queried on the given ids.
+        if self._matching_ids is None or ids == []:
             return
-        self._ids = [d["id"] for d in self.table.GetTable(("id",), sort_by, filter_strings, tags)]
-        self._row_map = [self._ids_dict[i] for i in self._ids]
+
+        (filter_strings, tags) = self._matching_filters
+        data = self._table.GetTable(("id",), None, filter_strings, tags, ids)
+        self._matching_ids.difference_update(ids)
+        self._matching_ids.update(d["id"] for d in data)
+
+    def Query(self, sort_by, filter_strings, tags, ids=None):
+        # Returns the sorted ids matching the filters, restricting to ids if given.
+        # Sorting is done in memory, and filtering only queries _table when the filters change.
+        if self._table is None:
+            return []
+
+        matching = self._Matching(filter_strings, tags)
+        if ids is not None:
+            indices = [self._ids_dict[i] for i in ids if matching is None or i in matching]
+            return [
+                self._raw_ids[i] for i in sorted(
+                    indices, key=self._KeyFunction(sort_by.key),
+                    reverse=sort_by.order == SortBy.DESCENDING
+                )
+            ]
+
+        ids = [self._raw_ids[i] for i in self._Permutation(sort_by)]
+        if matching is None:
+            return ids
+        return [i for i in ids if i in matching]
+
+    def Positions(self, ids, sort_by):
+        # For each of the ids, returns the row index where it should be inserted into the
+        # current rows, which must be sorted with sort_by.
+        key_function = self._KeyFunction(sort_by.key)
+        keys = [key_function(self._ids_dict[i]) for i in self._ids]
+        new_keys = [key_function(self._ids_dict[i]) for i in ids]
+        if sort_by.order == SortBy.DESCENDING:
+            keys.reverse()
+            return [len(keys) - bisect.bisect_left(keys, k) for k in new_keys]
+        return [bisect.bisect_left(keys, k) for k in new_keys]
+
+    def SortFilter(self, sort_by, filter_strings, tags):
+        self.SetIds(self.Query(sort_by, filter_strings, tags))
+
+    def SetIds(self, ids):
+        self._ids = list(ids)
+        self._rows = None
+
+    def RemoveRows(self, first, last):
+        del self._ids[first:last + 1]
+        self._rows = None
+
+    def InsertIds(self, position, ids):
+        self._ids[position:position] = ids
+        self._rows = None
 
     @staticmethod
-    def _FormatAuthors(authors):
-        return ", ".join([a.split(",", 1)[0] for a in authors])
+    def _FormatDisplay(data):
+        # Returns the (title, authors) pairs stored in the display cache.
+        # Titles are rendered all at once, which allows to do it in parallel.
+        titles = LatexToTextMany(t if (t := d["title"]) is not None else "" for d in data)
+        authors = [
+            TableData._FormatAuthors(d["authors"] + d["editors"], d["collaborations"])
+            for d in data
+        ]
+        return list(zip(titles, authors))
 
     @staticmethod
-    def _FormatTitle(text):
-        if HAS_PYLATEXENC:
-            return LatexNodes2Text().latex_to_text(text)
+    def _FormatAuthors(authors, collaborations):
+        # Large collaborations are shown by name, followed by their first authors.
+        text = TableData._Surnames(authors[:TableData._MAX_AUTHORS])
+        if len(authors) > TableData._MAX_AUTHORS:
+            text = f"{text} et al."
+        if collaborations != []:
+            names = ", ".join(f"{c} Collaboration" for c in collaborations)
+            text = f"{names} ({text})" if text != "" else names
         return text
 
+    @staticmethod
+    def _Surnames(authors):
+        return ", ".join([a.split(",", 1)[0] for a in authors])
+
 
 class TableRow:
     ''' A row in TableData.
         NOTE: a TableRow object should be used immediately and then discarded!
     '''
 
-    def __init__(self, index, id, table_data):
-        self._index = index # The row index in raw_data
+    # Keys of the properties below, which are fetched together on first access
+    _KEYS = (
+        "arxiv_id",
+        "inspire_id",
+        "dois",
+        "tags",
+        "files"
+    )
+
+    def __init__(self, position, id, table_data):
+        self._position = position
         self._id = id
         self._table_data = table_data
+        self._data = None
 
     def __len__(self):
         return len(TableModel.HEADERS)
 
     def __getitem__(self, position):
-        return self._table_data.raw_data[self._index][position]
+        return self._table_data.Cell(self._position, position)
+
+    def _Get(self, key):
+        if self._data is None:
+            self._data = self._table_data.table.GetRow(self._id, TableRow._KEYS)
+        return self._data[key]
 
     @property
     def id(self):
@@ -118,23 +479,23 @@ class TableRow:
 
     @property
     def arxiv_id(self):
-        return self._table_data.table.GetRow(self._id, ("arxiv_id",))["arxiv_id"]
+        return self._Get("arxiv_id")
 
     @property
     def inspire_id(self):
-        return self._table_data.table.GetRow(self._id, ("inspire_id",))["inspire_id"]
+        return self._Get("inspire_id")
 
     @property
     def dois(self):
-        return self._table_data.table.GetRow(self._id, ("dois",))["dois"]
+        return self._Get("dois")
 
     @property
     def tags(self):
-        return self._table_data.table.GetRow(self._id, ("tags",))["tags"]
+        return self._Get("tags")
 
     @property
     def files(self):
-        return self._table_data.table.GetRow(self._id, ("files",))["files"]
+        return self._Get("files")
 
 
 class SortTreeBy(SortBy):
@@ -168,6 +529,7 @@ class TableModel(QAbstractItemModel):
         "Title": Qt.AlignLeft,
         "Cites": Qt.AlignRight
     }
+    _FILTER_DELAY = 150     # In milliseconds
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -176,11 +538,26 @@ class TableModel(QAbstractItemModel):
         self._table = None
 
         self._table_data = TableData(None)
+        # Number of rows exposed to views, which fetch more as they scroll.
+        # Only the exposed rows are reported by the row signals of the model.
+        self._fetched = 0
 
         self._sort_by = SortTreeBy(key="date", order=Qt.DescendingOrder)
         self._filter_strings = []
         self._tags = []
 
+        # Filter strings are applied after a pause in typing. When they require a query on
+        # a database file, it is run in the background and the view keeps showing the
+        # previous result until it arrives.
+        self._requested_filter_strings = []
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(TableModel._FILTER_DELAY)
+        self._filter_timer.timeout.connect(self._LaunchFilter)
+        self._query = BackgroundQuery(self)
+        self._query.Finished.connect(self._HandleQueryFinished)
+        self._query.Failed.connect(self._HandleQueryFailed)
+
     def __len__(self):
         return len(self._table_data)
 
@@ -190,7 +567,32 @@ class TableModel(QAbstractItemModel):
     def rowCount(self, parent=QModelIndex()):
         if parent.isValid():
             return 0
-        return len(self._table_data)
+        return self._fetched
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._fetched < len(self._table_data)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        self._FetchTo(self._fetched + TableData.PAGE_SIZE - 1)
+
+    def FetchAll(self):
+        self._FetchTo(len(self._table_data) - 1)
+
+    def _FetchTo(self, row):
+        # Exposes all the rows up to the given one.
+        last = min(row, len(self._table_data) - 1)
+        if last < self._fetched:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, last)
+        self._fetched = last + 1
+        self.endInsertRows()
+
+    def _ResetFetched(self):
+        self._fetched = min(len(self._table_data), TableData.PAGE_SIZE)
 
     def columnCount(self, parent=QModelIndex()):
         if parent.isValid():
@@ -210,9 +612,11 @@ class TableModel(QAbstractItemModel):
             return None
         match role:
             case Qt.DisplayRole:
-                return self[index.row()][index.column()]
+                return self._table_data.Cell(index.row(), index.column())
             case Qt.TextAlignmentRole:
                 return TableModel._TEXT_ALIGNMENT[TableModel.HEADERS[index.column()]]
+            case Qt.ToolTipRole if TableModel.HEADERS[index.column()] == "Authors":
+                return self._table_data.AuthorsToolTip(index.row())
             case _:
                 return None
 
@@ -237,9 +641,8 @@ class TableModel(QAbstractItemModel):
         return ["application/x-eddy", "text/plain"]
 
     def mimeData(self, indexes):
-        rows = [self[r] for r in list({i.row() for i in indexes})]
-        ids = [r.id for r in rows]
-        records = [r.record for r in rows]
+        ids = [self[r].id for r in list({i.row() for i in indexes})]
+        records = self._table.GetRows(ids)
         texkeys = [r["texkey"] for r in records if r["texkey"] is not None]
         file_ = str(self._table.database.file)
         data_list = [file_, ids, records]
@@ -263,48 +666,216 @@ class TableModel(QAbstractItemModel):
 
     def _SetTable(self, database_table):
         self._tags = []
+        self._filter_timer.stop()
+        self._query.Cancel()
+        self._filter_strings = self._requested_filter_strings
 
+        # Once the table is cleared, the changes that follow apply to it from empty.
         if self._table is not None:
-            self._table.Cleared.disconnect(self.Clear)
-            self._table.Updated.disconnect(self.Update)
+            self._table.Cleared.disconnect(self.Update)
+            self._table.Changed.disconnect(self._ApplyChanges)
 
         self._table = database_table
-        self._table.Cleared.connect(self.Clear)
-        self._table.Updated.connect(self.Update)
+        self._table.Cleared.connect(self.Update)
+        self._table.Changed.connect(self._ApplyChanges)
 
         # By first clearing, we empy _selected_ids in the view.
         self.Clear()
         self.Update()
 
     def SetTags(self, tags):
+        # Tags are applied at once, followed by the filter strings still pending, if any.
         self._tags = [t.id for t in tags]
+        self._query.Cancel()
         self._Filter()
+        if self._requested_filter_strings != self._filter_strings:
+            self._LaunchFilter()
 
     def Clear(self):
         self.beginResetModel()
         self._table_data = TableData(None)
+        self._ResetFetched()
         self.endResetModel()
 
     def Update(self):
         self.beginResetModel()
         self._table_data = TableData(self._table)
         self._CreateSortFilterMap()
+        self._ResetFetched()
         self.endResetModel()
 
+    def _ApplyChanges(self, changes):
+        # Changes are applied row by row: rows whose position in the view cannot change
+        # are just refreshed, while the others are moved, inserted or removed.
+        if self._query.IsRunning():
+            # The pending result may not account for the changes, so it is requested again.
+            self._query.Cancel()
+            self._filter_timer.start()
+
+        if changes.reset:
+            self.Update()
+            return
+
+        self._table_data.Discard(changes.deleted)
+        self._table_data.Refresh(list(changes.updated) + changes.inserted)
+
+        if changes.updated == {} and changes.deleted == set():
+            self._Append(changes.inserted)
+            return
+
+        order_keys = self._OrderKeys()
+        if (changes.inserted != [] or changes.deleted != set()
+                or any(k & order_keys for k in changes.updated.values())):
+            self._Rearrange()
+
+        last_column = len(TableModel.HEADERS) - 1
+        for i in changes.updated:
+            if (row := self._table_data.Row(i)) is not None and row < self._fetched:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+    def _Append(self, ids):
+        # Inserts new rows at their sorted positions, without touching the existing ones.
+        # This is the path taken by the batches of a web search.
+        ids = self._table_data.Query(self._sort_by, self._filter_strings, self._tags, ids)
+        positions = self._table_data.Positions(ids, self._sort_by)
+
+        # Since ids are sorted, positions is non-decreasing and each run of equal positions
+        # corresponds to a block of contiguous rows.
+        start = 0
+        for (n, p) in enumerate(positions):
+            if n + 1 < len(positions) and positions[n + 1] == p:
+                continue
+            self._InsertIds(p + start, ids[start:n + 1])
+            start = n + 1
+
+    def _OrderKeys(self):
+        # The keys whose change can affect the position or the visibility of a row.
+        keys = {self._sort_by.key}
+        if self._sort_by.key == "authors":
+            keys.add("editors")
+        if self._filter_strings != []:
+            keys.update(ItemsTable.SEARCH_KEYS)
+        if self._tags != []:
+            keys.add("tags")
+        return keys
+
+    def _Rearrange(self):
+        # Brings the view to the current order and filters of the table,
+        # by first removing rows, then moving the remaining ones and finally inserting.
+        new_ids = self._table_data.Query(self._sort_by, self._filter_strings, self._tags)
+        new_ids_set = set(new_ids)
+
+        removed = [r for (r, i) in enumerate(self._table_data.ids) if i not in new_ids_set]
+        for (first, last) in reversed(TableModel._Blocks(removed)):
+            self._RemoveRows(first, last)
+
+        kept = self._table_data.ids
+        kept_set = set(kept)
+        kept_sorted = [i for i in new_ids if i in kept_set]
+        if kept_sorted != kept:
+            self.layoutAboutToBeChanged.emit()
+            old_ids = list(kept)
+            self._table_data.SetIds(kept_sorted)
+            new_rows = {i: r for (r, i) in enumerate(kept_sorted)}
+            old_indices = self.persistentIndexList()
+            # Rows moved past the exposed ones are no longer valid indices.
+            new_indices = [
+                self.index(new_rows[old_ids[i.row()]], i.column()) for i in old_indices
+            ]
+            self.changePersistentIndexList(old_indices, new_indices)
+            self.layoutChanged.emit()
+
+        inserted = [r for (r, i) in enumerate(new_ids) if i not in kept_set]
+        for (first, last) in TableModel._Blocks(inserted):
+            self._InsertIds(first, new_ids[first:last + 1])
+
+    def _InsertIds(self, position, ids):
+        # Rows are exposed if they are inserted among the exposed ones, or if all of them are.
+        if position < self._fetched or self._fetched == len(self._table_data):
+            self.beginInsertRows(QModelIndex(), position, position + len(ids) - 1)
+            self._table_data.InsertIds(position, ids)
+            self._fetched = self._fetched + len(ids)
+            self.endInsertRows()
+        else:
+            self._table_data.InsertIds(position, ids)
+
+    def _RemoveRows(self, first, last):
+        if first < self._fetched:
+            last_fetched = min(last, self._fetched - 1)
+            self.beginRemoveRows(QModelIndex(), first, last_fetched)
+            self._table_data.RemoveRows(first, last)
+            self._fetched = self._fetched - (last_fetched - first + 1)
+            self.endRemoveRows()
+        else:
+            self._table_data.RemoveRows(first, last)
+
+    @staticmethod
+    def _Blocks(rows):
+        # Splits an ascending list of row indices into blocks (first, last) of contiguous rows.
+        blocks = []
+        for r in rows:
+            if blocks != [] and blocks[-1][1] == r - 1:
+                blocks[-1][1] = r
+            else:
+                blocks.append([r, r])
+        return [tuple(b) for b in blocks]
+
     def Filter(self, filter_strings):
+        self._requested_filter_strings = filter_strings
+        if filter_strings == []:
+            self._LaunchFilter()
+        else:
+            self._filter_timer.start()
+
+    def _LaunchFilter(self):
+        self._filter_timer.stop()
+        self._query.Cancel()
+
+        filter_strings = self._requested_filter_strings
+        if (self._table is None or not BackgroundQuery.Supports(self._table)
+                or self._table_data.CanMatch(filter_strings, self._tags)):
+            self._filter_strings = filter_strings
+            self._Filter()
+        else:
+            self._query.Run(self._table, filter_strings, self._tags)
+
+    def _HandleQueryFinished(self, filter_strings, tags, ids):
+        # The result is for the filter strings of the query, which may be older than the
+        # requested ones. In that case, the debounce timer is still running.
+        self._table_data.SetMatching(filter_strings, tags, ids)
+        self._filter_strings = filter_strings
+        self._Filter()
+
+    def _HandleQueryFailed(self, filter_strings, tags):
+        # The filter is applied on this thread instead, where any lasting error surfaces.
         self._filter_strings = filter_strings
         self._Filter()
 
     def _Filter(self):
         self.beginResetModel()
         self._CreateSortFilterMap()
+        self._ResetFetched()
         self.endResetModel()
 
     def FilterSelection(self, ids):
-        return [i for i in ids if i in self._table_data.ids]
+        return [i for i in ids if self._table_data.Row(i) is not None]
 
     def IndicesFromIds(self, ids):
-        return [self.index(self._table_data.ids.index(i), 0) for i in ids]
+        # Rows are fetched as needed, so that all the indices are valid.
+        rows = [self._table_data.Row(i) for i in ids]
+        if rows != []:
+            self._FetchTo(max(rows))
+        return [self.index(r, 0) for r in rows]
+
+    def SelectionFromIds(self, ids):
+        # Returns the selection of the rows of ids, as ranges of contiguous rows.
+        rows = sorted(self._table_data.Row(i) for i in ids)
+        if rows != []:
+            self._FetchTo(rows[-1])
+        selection = QItemSelection()
+        for (first, last) in TableModel._Blocks(rows):
+            selection.select(self.index(first, 0), self.index(last, 0))
+        return selection
 
     def NewItem(self):
         data = {"date": datetime.today().strftime("%Y-%m-%d")}
@@ -324,9 +895,17 @@ class TableModel(QAbstractItemModel):
 
 class TableView(QTreeView):
     ItemSelected = Signal(int)
+    PrefetchRequested = Signal(list)
     NewTabRequested = Signal(dict)
     StatusUpdated = Signal(int, list)
 
+    # ItemSelected is emitted only once the selection has been stable for this long,
+    # so that moving across rows with the keyboard does not display every item passed.
+    _SELECTION_DELAY = 80       # In milliseconds
+    # After this further idle time, the items in the neighbouring rows are prefetched.
+    _PREFETCH_DELAY = 300       # In milliseconds
+    _PREFETCH_ROWS = 2
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -354,12 +933,28 @@ class TableView(QTreeView):
 
         self._selected_ids = []
 
+        self._selected_id = -1
+        self._selection_timer = QTimer(self)
+        self._selection_timer.setSingleShot(True)
+        self._selection_timer.setInterval(TableView._SELECTION_DELAY)
+        self._selection_timer.timeout.connect(self._DispatchSelection)
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(TableView._PREFETCH_DELAY)
+        self._prefetch_timer.timeout.connect(self._RequestPrefetch)
+
         self.setDragDropMode(QAbstractItemView.DragOnly)
 
     @property
     def _model(self):
         return self.model()
 
+    def selectAll(self):
+        # Only the fetched rows can be selected, so all of them are fetched first.
+        if self._model is not None:
+            self._model.FetchAll()
+        super().selectAll()
+
     def setModel(self, model):
         if self._model is not None:
             model.modelAboutToBeReset.disconnect(self._SaveSelection)
@@ -386,13 +981,35 @@ class TableView(QTreeView):
     def selectionChanged(self, selected, deselected):
         super().selectionChanged(selected, deselected)
 
-        ids = [self._model[r.row()].id for r in self.selectionModel().selectedRows()]
-        if len(ids) == 1:
-            self.ItemSelected.emit(*ids)
-        else:
-            self.ItemSelected.emit(-1)
+        ids = self.SelectedIds()
+        self._QueueSelection(ids[0] if len(ids) == 1 else -1)
+
+        self.StatusUpdated.emit(len(self._model), ids)
+
+    def _QueueSelection(self, id_):
+        # Restarts the countdown, so that only the last of a burst of changes is delivered.
+        self._selected_id = id_
+        self._prefetch_timer.stop()
+        self._selection_timer.start()
 
-        self.StatusUpdated.emit(self._model.rowCount(), ids)
+    def _DispatchSelection(self):
+        self.ItemSelected.emit(self._selected_id)
+        if self._selected_id != -1:
+            self._prefetch_timer.start()
+
+    def _RequestPrefetch(self):
+        rows = self.selectionModel().selectedRows()
+        if len(rows) != 1:
+            return
+
+        row = rows[0].row()
+        neighbours = (
+            r for n in range(1, TableView._PREFETCH_ROWS + 1) for r in (row + n, row - n)
+            if 0 <= r < self._model.rowCount()
+        )
+        ids = [self._model[r].id for r in neighbours]
+        if ids != []:
+            self.PrefetchRequested.emit(ids)
 
     def startDrag(self, supportedActions):
         # We reimplement this to visualize a tooltip instead of entire rows while dragging.
@@ -420,32 +1037,38 @@ class TableView(QTreeView):
             self._show_citations = show
             self._SetColumnVisibility()
 
+    def SelectedIds(self):
+        return [self._model[r.row()].id for r in self.selectionModel().selectedRows()]
+
+    def SelectIds(self, ids):
+        ids = self._model.FilterSelection(ids)
+        if ids == []:
+            return
+
+        self.selectionModel().select(
+            self._model.SelectionFromIds(ids),
+            QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows
+        )
+
     def _SaveSelection(self):
-        self._selected_ids = [
-            self._model[r.row()].id for r in self.selectionModel().selectedRows()
-        ]
+        self._selected_ids = self.SelectedIds()
 
     def _RestoreSelection(self):
         # I have no idea why this does not work if executed at the end of reset(),
         # which, by the way, is triggered by the same signal!
 
         if self._selected_ids == []:
-            self.StatusUpdated.emit(self._model.rowCount(), 0)
+            self.StatusUpdated.emit(len(self._model), 0)
             return
 
         ids = self._model.FilterSelection(self._selected_ids)
         if ids == []:
-            self.ItemSelected.emit(-1)
-            self.StatusUpdated.emit(self._model.rowCount(), 0)
+            self._QueueSelection(-1)
+            self.StatusUpdated.emit(len(self._model), 0)
             return
 
-        indices = self._model.IndicesFromIds(ids)
-
-        selection = QItemSelection()
-        for i in indices:
-            selection.select(i, i)
         self.selectionModel().select(
-            selection,
+            self._model.SelectionFromIds(ids),
             QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows
         )
 
@@ -40,6 +40,9 @@ class Fetcher(QObject):
             self._reply = None
             self.FetchingStopped.emit()
 
+    def IsFetching(self):
+        return self._reply is not None
+
     def Fetch(self, plugin, search_string):
         self.Stop()
 
@@ -176,6 +176,9 @@ class InspirePlugin:
             item["editors"] = editors
             item["editors_bais"] = editors_bais
 
+        if "collaborations" in data:
+            item["collaborations"] = [c["value"] for c in data["collaborations"]]
+
         item["title"] = data["titles"][0]["title"]
         # item["title"] = next(
         #     (t["title"] for t in data["titles"] if "<math display=" not in t["title"]))
@@ -11,20 +11,35 @@ from urllib.request import urlretrieve
 from zipfile import ZipFile
 
 from eddy.database.database import Database
-from eddy.database.items import ItemsTable
-from eddy.database.tags import TagsTable
+from eddy.database.migrations import MIGRATIONS
 
 
 KATEX_URL = "https://github.com/KaTeX/KaTeX/releases/download/v0.16.9/katex.zip"
 EXTERN_FOLDER = ROOT_DIR / "extern"
 
+# The journal mode is stored in the file, and is left to the settings of the application.
+PROFILE = {"journal_mode": None}
+
 def NewDatabase(file):
     if file.exists():
         print(f"{sys.argv[0]}: Cannot create database file ‘{file}’: File exists")
     else:
-        database = Database(file)
-        ItemsTable(database).Clear()
-        TagsTable(database).Clear()
+        Database(file, MIGRATIONS, PROFILE)
+
+def MigrateDatabase(file):
+    if not file.is_file():
+        print(f"{sys.argv[0]}: Cannot open database file ‘{file}’: No such file")
+        return
+
+    database = Database(file, profile=PROFILE)
+    old_version = database.Version()
+    database.Migrate(MIGRATIONS)
+    new_version = database.Version()
+
+    if new_version == old_version:
+        print(f"Database ‘{file}’ is up to date (version {new_version})")
+    else:
+        print(f"Database ‘{file}’ upgraded from version {old_version} to {new_version}")
 
 def KaTeXDownload():
     # TODO: Catch possible errors in the download
@@ -42,6 +57,10 @@ if __name__ == "__main__":
     parser_new = subparsers.add_parser("new", help="creates an Eddy database")
     parser_new.add_argument("FILE", type=Path, help="the file name of the new database")
 
+    parser_migrate = subparsers.add_parser(
+        "migrate", help="upgrades an Eddy database to the latest schema")
+    parser_migrate.add_argument("FILE", type=Path, help="the file name of the database")
+
     parser_katex = subparsers.add_parser("katex-download", help="downloads and installs KaTeX")
 
     args = parser.parse_args()
@@ -49,5 +68,7 @@ if __name__ == "__main__":
     match args.command:
         case "new":
             NewDatabase(args.FILE)
+        case "migrate":
+            MigrateDatabase(args.FILE)
         case "katex-download":
             KaTeXDownload()
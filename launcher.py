@@ -6,6 +6,8 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(ROOT_DIR))
 
-from eddy.main import run
-
-run()
+# The guard is needed by the worker processes, which import this module. The GUI is only
+# imported within it, so that they do not load Qt.
+if __name__ == "__main__":
+    from eddy.main import run
+    run()